@@ -3,11 +3,12 @@ Dashboard Streamlit pour le monitoring EIOPA
 Bonus : Interface interactive pour visualiser les taux et l'historique
 """
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
 
-from config import TARGET_COUNTRY, TARGET_MATURITIES
+from config import TARGET_COUNTRY, TARGET_MATURITIES, BPS_CONVERSION
 from src.analyzer import EIOPAAnalyzer
 from src.downloader import EIOPADownloader
 from src.processor import EIOPAProcessor
@@ -42,28 +43,31 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
-@st.cache_data(ttl=3600)
-def load_historical_data():
-    """Charge les données historiques avec cache"""
-    analyzer = EIOPAAnalyzer()
-    return analyzer.historical_data
-
-
 @st.cache_resource
 def get_analyzer():
     """Récupère l'analyzer (singleton)"""
     return EIOPAAnalyzer()
 
 
-def plot_yield_curve(rates: dict, title: str = "Courbe des taux"):
+def load_historical_data():
+    """Données historiques du singleton (DataFrame déjà mis en cache par l'analyzer)"""
+    return get_analyzer().historical_data
+
+
+def curve_arrays(rates: dict):
+    """Convertit un dictionnaire {maturité: taux} en tableaux (maturités triées, taux en %)"""
+    maturities = np.array(sorted(rates), dtype=np.int64)
+    values = np.fromiter((rates[m] for m in maturities), dtype=np.float64, count=len(maturities))
+    return maturities, values * 100.0
+
+
+@st.cache_data(max_entries=64)
+def plot_yield_curve(maturities: np.ndarray, rates_pct: np.ndarray, title: str = "Courbe des taux"):
     """Affiche la courbe des taux"""
-    maturities = sorted(rates.keys())
-    values = [rates[m] * 100 for m in maturities]
-    
     fig = go.Figure()
     fig.add_trace(go.Scatter(
         x=maturities,
-        y=values,
+        y=rates_pct,
         mode='lines+markers',
         name='Taux',
         line=dict(color='#1f77b4', width=3),
@@ -81,15 +85,16 @@ def plot_yield_curve(rates: dict, title: str = "Courbe des taux"):
     return fig
 
 
-def plot_time_series(df: pd.DataFrame, maturity: int, title: str = None):
+@st.cache_data(max_entries=64)
+def plot_time_series(dates: np.ndarray, rates_pct: np.ndarray, maturity: int, title: str = None):
     """Affiche une série temporelle"""
     if title is None:
         title = f"Évolution du taux {maturity}Y"
     
     fig = go.Figure()
     fig.add_trace(go.Scatter(
-        x=df['reference_date'],
-        y=df['rate'] * 100,
+        x=dates,
+        y=rates_pct,
         mode='lines',
         name=f'Taux {maturity}Y',
         line=dict(color='#2ca02c', width=2)
@@ -106,16 +111,15 @@ def plot_time_series(df: pd.DataFrame, maturity: int, title: str = None):
     return fig
 
 
-def plot_comparison(current_rates: dict, previous_rates: dict):
+@st.cache_data(max_entries=64)
+def plot_comparison(maturities: np.ndarray, current_pct: np.ndarray, previous_pct: np.ndarray):
     """Compare deux courbes de taux"""
-    maturities = sorted(current_rates.keys())
-    
     fig = go.Figure()
     
     # Courbe actuelle
     fig.add_trace(go.Scatter(
         x=maturities,
-        y=[current_rates[m] * 100 for m in maturities],
+        y=current_pct,
         mode='lines+markers',
         name='Actuel',
         line=dict(color='#1f77b4', width=3),
@@ -125,7 +129,7 @@ def plot_comparison(current_rates: dict, previous_rates: dict):
     # Courbe précédente
     fig.add_trace(go.Scatter(
         x=maturities,
-        y=[previous_rates.get(m, 0) * 100 for m in maturities],
+        y=previous_pct,
         mode='lines+markers',
         name='Précédent',
         line=dict(color='#ff7f0e', width=3, dash='dash'),
@@ -184,60 +188,48 @@ def show_overview():
     
     analyzer = get_analyzer()
     
-    if analyzer.historical_data.empty:
+    latest = analyzer.get_latest(TARGET_COUNTRY)
+    if latest is None:
         st.warning("⚠️ Aucune donnée disponible. Effectuez une première mise à jour.")
         return
     
     # Dernières données
-    latest_row = analyzer.historical_data.iloc[-1]
-    latest_date = latest_row['reference_date']
+    latest_date = latest.date
     
     st.subheader(f"📅 Dernière mise à jour : {latest_date.strftime('%d/%m/%Y')}")
     
     # Métriques principales
+    latest_pct = latest.rates * 100
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        rate_1y = latest_row['rate_1y'] * 100
-        st.metric("Taux 1Y", f"{rate_1y:.2f}%")
+        st.metric("Taux 1Y", f"{latest_pct[TARGET_MATURITIES.index(1)]:.2f}%")
     
     with col2:
-        rate_10y = latest_row['rate_10y'] * 100
-        st.metric("Taux 10Y", f"{rate_10y:.2f}%")
+        st.metric("Taux 10Y", f"{latest_pct[TARGET_MATURITIES.index(10)]:.2f}%")
     
     with col3:
-        rate_30y = latest_row['rate_30y'] * 100
-        st.metric("Taux 30Y", f"{rate_30y:.2f}%")
+        st.metric("Taux 30Y", f"{latest_pct[TARGET_MATURITIES.index(30)]:.2f}%")
     
     with col4:
-        va = latest_row['va'] * 100 if pd.notna(latest_row['va']) else 0
+        va = 0 if np.isnan(latest.va) else latest.va * 100
         st.metric("VA", f"{va:.2f}%")
     
     # Courbe actuelle
     st.subheader("📈 Courbe des taux actuelle")
     
-    rates = {}
-    for maturity in TARGET_MATURITIES:
-        col_name = f'rate_{maturity}y'
-        if col_name in latest_row and pd.notna(latest_row[col_name]):
-            rates[maturity] = float(latest_row[col_name])
-    
-    if rates:
-        fig = plot_yield_curve(rates)
+    valid = ~np.isnan(latest.rates)
+    if valid.any():
+        fig = plot_yield_curve(np.asarray(TARGET_MATURITIES)[valid], latest_pct[valid])
         st.plotly_chart(fig, use_container_width=True)
     
     # Évolution récente (6 derniers mois)
     st.subheader("📊 Évolution récente (Taux 10Y)")
     
-    six_months_ago = latest_date - timedelta(days=180)
-    ts = analyzer.get_time_series(
-        country=TARGET_COUNTRY,
-        maturity=10,
-        start_date=six_months_ago
-    )
+    ts = analyzer.get_recent_series(TARGET_COUNTRY, maturity=10, days=180)
     
     if not ts.empty:
-        fig = plot_time_series(ts, 10)
+        fig = plot_time_series(ts['reference_date'].to_numpy(), ts['rate'].to_numpy() * 100.0, 10)
         st.plotly_chart(fig, use_container_width=True)
 
 
@@ -324,42 +316,53 @@ def run_update(selected_rows: list):
     total = len(selected_rows)
     progress_bar = st.progress(0)
     status = st.empty()
-    results = []
+    outcomes = {}   # Date -> (succès, message)
+    processed = []
  
+    # Téléchargements en parallèle sur une même session
+    status.text(f"Téléchargement de {total} fichier(s)...")
+    downloader = EIOPADownloader()
+    zip_paths = downloader.download_files([(row["_filename"], row["_url"]) for row in selected_rows])
+ 
+    # Traitement séquentiel : pas de pool de processus dans le serveur Streamlit
     for i, row in enumerate(selected_rows):
         label = row["Date"]
-        status.text(f"[{i+1}/{total}] Traitement de {label}...")
+        zip_path = zip_paths.get(row["_filename"])
+        if not zip_path:
+            outcomes[label] = (False, "Échec du téléchargement")
+        else:
+            status.text(f"Traitement {i + 1}/{total} : {label}...")
+            try:
+                current_data = EIOPAProcessor(zip_path).process()
+                error = "Échec du traitement"
+            except Exception as e:
+                current_data, error = None, str(e)
+            if current_data:
+                processed.append((label, current_data))
+            else:
+                outcomes[label] = (False, error)
+        progress_bar.progress((i + 1) / total)
  
+    # Historique : une seule sauvegarde pour tout le lot, puis analyse et rapport
+    if processed:
+        analyzer = get_analyzer()
         try:
-            # Téléchargement
-            downloader = EIOPADownloader()
-            zip_path = downloader.download_file(row["_url"], row["_filename"])
-            if not zip_path:
-                results.append((label, False, "Échec du téléchargement"))
-                continue
- 
-            # Traitement
-            processor = EIOPAProcessor(zip_path)
-            current_data = processor.process()
-            if not current_data:
-                results.append((label, False, "Échec du traitement"))
-                continue
+            analyzer.add_many([data for _, data in processed])
+        except Exception as e:
+            outcomes.update((label, (False, str(e))) for label, _ in processed)
+            processed = []
  
-            # Analyse et historique
-            analyzer = get_analyzer()
-            analyzer.add_to_historical(current_data)
+    reporter = EIOPAReporter()
+    for label, current_data in processed:
+        try:
             analysis = analyzer.analyze(current_data)
- 
-            # Rapport
-            reporter = EIOPAReporter()
             reporter.generate_text_report(analysis)
- 
-            results.append((label, True, f"{len(current_data['rates'])} taux extraits"))
- 
+            outcomes[label] = (True, f"{len(current_data['rates'])} taux extraits")
         except Exception as e:
-            results.append((label, False, str(e)))
+            outcomes[label] = (False, str(e))
  
-        progress_bar.progress((i + 1) / total)
+    # Résultats dans l'ordre de la sélection
+    results = [(row["Date"], *outcomes[row["Date"]]) for row in selected_rows]
  
     progress_bar.empty()
     status.empty()
@@ -434,7 +437,7 @@ def show_historical_page():
     )
     
     if not ts.empty:
-        fig = plot_time_series(ts, maturity)
+        fig = plot_time_series(ts['reference_date'].to_numpy(), ts['rate'].to_numpy() * 100.0, maturity)
         st.plotly_chart(fig, use_container_width=True)
         
         # Tableau de données
@@ -486,26 +489,31 @@ def show_analysis_page():
     
     # Comparaison des courbes
     st.subheader("📈 Comparaison des courbes")
-    fig = plot_comparison(data1['rates'], data2['rates'])
+    maturities, current_pct = curve_arrays(data1['rates'])
+    previous_pct = np.fromiter((data2['rates'].get(m, 0) for m in maturities), dtype=np.float64, count=len(maturities)) * 100.0
+    fig = plot_comparison(maturities, current_pct, previous_pct)
     st.plotly_chart(fig, use_container_width=True)
     
     # Tableau de variations
     st.subheader("📊 Variations (en points de base)")
     
-    variations = []
-    for maturity in sorted(data1['rates'].keys()):
-        if maturity in data2['rates']:
-            rate1 = data1['rates'][maturity]
-            rate2 = data2['rates'][maturity]
-            change_bps = (rate1 - rate2) * 10000
-            
-            variations.append({
-                'Maturité': f'{maturity}Y',
-                'Date 1': format_rate_pct(rate1),
-                'Date 2': format_rate_pct(rate2),
-                'Variation (bps)': f"{change_bps:+.1f}",
-                'Variation (%)': f"{((rate1/rate2 - 1) * 100):+.2f}%"
-            })
+    m = np.fromiter((k for k in sorted(data1['rates']) if k in data2['rates']), dtype=np.int32)
+    r1 = np.fromiter((data1['rates'][k] for k in m), dtype=np.float64, count=len(m))
+    r2 = np.fromiter((data2['rates'][k] for k in m), dtype=np.float64, count=len(m))
+    bps = (r1 - r2) * BPS_CONVERSION
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pct = (r1 / r2 - 1.0) * 100.0
+    
+    variations = [
+        {
+            'Maturité': f'{maturity}Y',
+            'Date 1': format_rate_pct(rate1),
+            'Date 2': format_rate_pct(rate2),
+            'Variation (bps)': f"{change_bps:+.1f}",
+            'Variation (%)': f"{change_pct:+.2f}%"
+        }
+        for maturity, rate1, rate2, change_bps, change_pct in zip(m.tolist(), r1.tolist(), r2.tolist(), bps.tolist(), pct.tolist())
+    ]
     
     df_variations = pd.DataFrame(variations)
     st.dataframe(df_variations, use_container_width=True, hide_index=True)
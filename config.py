@@ -12,8 +12,12 @@ EXTRACTS_DIR  = DATA_DIR / "extracts"
 PROCESSED_DIR = DATA_DIR / "processed"
 LOG_DIR       = BASE_DIR / "logs"
 
-for directory in [DATA_DIR, RAW_DIR, PROCESSED_DIR, LOG_DIR]:
-    directory.mkdir(parents=True, exist_ok=True)
+
+def ensure_dirs():
+    """Crée les dossiers de données et de logs (appelée par setup_logging, pas à l'import)."""
+    for directory in [DATA_DIR, RAW_DIR, EXTRACTS_DIR, PROCESSED_DIR, LOG_DIR]:
+        directory.mkdir(parents=True, exist_ok=True)
+
 
 # ==================== FICHIERS ====================
 HISTORICAL_FILE    = DATA_DIR / "historical.csv"
@@ -33,13 +37,35 @@ EXPECTED_EXCEL_FILES = [
 # Onglet principal des taux spot (utilisé par processor.py)
 EXCEL_SHEET_RFR = "RFR_spot_no_VA"
 
+# Taux cibles déjà extraits par archive (Parquet, voir processor.EIOPAProcessor._rates_cache_file)
+RATES_CACHE_DIR = EXTRACTS_DIR / ".rates_cache"
+
 # ==================== PAYS ET MATURITÉS ====================
 TARGET_COUNTRY    = "FR"
 TARGET_MATURITIES = [1, 5, 10, 20, 30]
 
+# Libellés possibles de la colonne pays dans les onglets EIOPA, par ordre de priorité
+COUNTRY_ALIASES = {
+    "FR": ["france", "french", "fr"],
+    "DE": ["germany", "german", "de"],
+    "IT": ["italy", "italian", "it"],
+    "ES": ["spain", "spanish", "es"],
+    "EUR": ["euro", "eur", "eurozone"],
+    "GB": ["united kingdom", "uk", "gb", "gbp"],
+    "US": ["united states", "usa", "us", "usd"],
+}
+
+# Colonnes de taux de l'historique, dans l'ordre de TARGET_MATURITIES
+RATE_COLS      = [f"rate_{m}y" for m in TARGET_MATURITIES]
+RATE_COL_INDEX = dict(zip(TARGET_MATURITIES, RATE_COLS))
+
 # ==================== RÉSEAU ====================
 REQUEST_TIMEOUT = 30
 MAX_RETRIES     = 3
+MAX_PARALLEL_DOWNLOADS = 8  # Téléchargements simultanés (taille du pool de connexions)
+LISTING_CACHE_FILE = RAW_DIR / ".listing_cache.json"  # Dernière liste des fichiers + ETag/Last-Modified
+LISTING_CACHE_TTL  = 3600  # Secondes pendant lesquelles la liste est réutilisée sans validateur HTTP
+DOWNLOAD_VALIDATORS_FILE = RAW_DIR / ".download_validators.json"  # ETag/Last-Modified des archives, par URL
 HEADERS = {
     "User-Agent": (
         "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
@@ -54,7 +80,12 @@ HEADERS = {
 # ==================== LOGGING ====================
 LOG_FORMAT      = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 LOG_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
-LOG_FILE        = LOG_DIR / f"eiopa_monitoring_{datetime.now().strftime('%Y%m')}.log"
+
+
+def get_log_file() -> Path:
+    """Fichier de log du mois courant, évalué à la création du handler et non à l'import."""
+    return LOG_DIR / f"eiopa_monitoring_{datetime.now():%Y%m}.log"
+
 
 # ==================== ANALYSE ====================
 ALERT_THRESHOLD_MOM = 50   # bps
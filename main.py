@@ -5,11 +5,7 @@ import argparse
 from datetime import datetime
 import sys
 
-from config import LATEST_REPORT_FILE
-from src.downloader import EIOPADownloader
-from src.processor import EIOPAProcessor
-from src.analyzer import EIOPAAnalyzer
-from src.reporter import EIOPAReporter
+from config import LATEST_REPORT_FILE, TARGET_COUNTRY
 from src.utils import setup_logging
 
 logger = setup_logging()
@@ -21,8 +17,15 @@ def run_monthly_update(specific_date: datetime = None, force_redownload: bool =
     
     Args:
         specific_date: Date spécifique à traiter (None = dernière disponible)
-        force_redownload: Forcer le re-téléchargement même si le fichier existe
+        force_redownload: Forcer le re-téléchargement (sans requête conditionnelle)
+                          et le retraitement même si l'archive n'a pas changé
     """
+    # Imports locaux : --list et --stats n'ont pas besoin de toute la chaîne
+    from src.downloader import EIOPADownloader
+    from src.processor import EIOPAProcessor
+    from src.analyzer import EIOPAAnalyzer
+    from src.reporter import EIOPAReporter
+    
     logger.info("=" * 80)
     logger.info("DÉMARRAGE DU MONITORING MENSUEL EIOPA")
     logger.info("=" * 80)
@@ -34,10 +37,10 @@ def run_monthly_update(specific_date: datetime = None, force_redownload: bool =
         
         if specific_date:
             logger.info(f"Recherche du fichier pour la date : {specific_date.strftime('%Y-%m-%d')}")
-            zip_path = downloader.download_by_date(specific_date)
+            zip_path = downloader.download_by_date(specific_date, force=force_redownload)
         else:
             logger.info("Recherche du dernier fichier disponible...")
-            zip_path = downloader.download_latest()
+            zip_path = downloader.download_latest(force=force_redownload)
         
         if not zip_path:
             logger.error("❌ Échec du téléchargement")
@@ -45,10 +48,21 @@ def run_monthly_update(specific_date: datetime = None, force_redownload: bool =
         
         logger.info(f"✅ Fichier téléchargé : {zip_path.name}")
         
-        # Étape 2 : Traitement
+        # Étape 2 : Traitement (évité si l'archive est inchangée, déjà dans l'historique
+        # et ses CSV exportés présents)
         logger.info("\n[Étape 2/4] Extraction et traitement des données...")
+        analyzer = EIOPAAnalyzer()
         processor = EIOPAProcessor(zip_path)
-        current_data = processor.process()
+        current_data = None
+        if zip_path in downloader.unchanged_files and processor.reference_date:
+            if all(path.exists() for path in processor._csv_paths()):
+                current_data = analyzer.get_historical_data(TARGET_COUNTRY, processor.reference_date)
+            if current_data:
+                logger.info("✅ Archive inchangée (304) — données reprises de l'historique")
+        
+        already_in_history = current_data is not None
+        if not already_in_history:
+            current_data = processor.process()
         
         if not current_data:
             logger.error("❌ Échec du traitement des données")
@@ -61,10 +75,10 @@ def run_monthly_update(specific_date: datetime = None, force_redownload: bool =
         
         # Étape 3 : Analyse
         logger.info("\n[Étape 3/4] Analyse et comparaison...")
-        analyzer = EIOPAAnalyzer()
         
         # Ajouter à l'historique
-        analyzer.add_to_historical(current_data)
+        if not already_in_history:
+            analyzer.add_to_historical(current_data)
         
         # Analyser avec comparaisons
         analysis = analyzer.analyze(current_data)
@@ -83,7 +97,7 @@ def run_monthly_update(specific_date: datetime = None, force_redownload: bool =
         
         # Rapport texte
         text_file = LATEST_REPORT_FILE
-        reporter.generate_text_report(analysis, text_file)
+        reporter.generate_text_report(analysis, text_file, return_text=False)
         logger.info(f"✅ Rapport texte : {text_file}")
         
         # Rapport CSV
@@ -119,6 +133,8 @@ def run_monthly_update(specific_date: datetime = None, force_redownload: bool =
 
 def list_available_files():
     """Liste tous les fichiers disponibles sur le site EIOPA"""
+    from src.downloader import EIOPADownloader
+    
     logger.info("Récupération de la liste des fichiers disponibles...")
     
     try:
@@ -129,17 +145,22 @@ def list_available_files():
             print("Aucun fichier trouvé")
             return
         
-        print(f"\n{'=' * 80}")
-        print(f"FICHIERS DISPONIBLES ({len(files)} fichiers)")
-        print(f"{'=' * 80}\n")
-        
-        for i, (filename, url, date) in enumerate(files[:20], 1):  # Limiter à 20
-            print(f"{i:2d}. {date.strftime('%Y-%m-%d')} - {filename}")
+        # Sortie construite puis écrite en une fois (un seul flush si redirigée)
+        lines = [
+            f"\n{'=' * 80}",
+            f"FICHIERS DISPONIBLES ({len(files)} fichiers)",
+            f"{'=' * 80}\n",
+        ]
+        lines.extend(
+            f"{i:2d}. {date.date().isoformat()} - {filename}"
+            for i, (filename, url, date) in enumerate(files[:20], 1)  # Limiter à 20
+        )
         
         if len(files) > 20:
-            print(f"\n... et {len(files) - 20} autres fichiers")
+            lines.append(f"\n... et {len(files) - 20} autres fichiers")
         
-        print(f"\n{'=' * 80}")
+        lines.append(f"\n{'=' * 80}")
+        print("\n".join(lines))
         
     except Exception as e:
         logger.error(f"Erreur : {e}")
@@ -206,7 +227,7 @@ Exemples d'utilisation:
     parser.add_argument(
         '--force',
         action='store_true',
-        help='Forcer le re-téléchargement'
+        help='Forcer le re-téléchargement et le retraitement'
     )
     
     args = parser.parse_args()
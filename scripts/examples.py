@@ -1,10 +1,14 @@
 """
 Exemples d'utilisation avancée du système de monitoring EIOPA
 """
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
+from functools import partial
 from pathlib import Path
+from typing import Optional
 
+from config import TARGET_MATURITIES, RATE_COLS, RATE_COL_INDEX, BPS_CONVERSION
 from src.analyzer import EIOPAAnalyzer
 from src.downloader import EIOPADownloader
 from src.processor import EIOPAProcessor
@@ -45,7 +49,7 @@ def example_1_basic_usage():
         print(f"\nVolatility Adjustment : {format_rate_pct(data['va'])}")
 
 
-def example_2_historical_analysis():
+def example_2_historical_analysis(analyzer: Optional[EIOPAAnalyzer] = None):
     """
     Exemple 2 : Analyse historique et séries temporelles
     """
@@ -53,7 +57,7 @@ def example_2_historical_analysis():
     print("EXEMPLE 2 : Analyse historique")
     print("=" * 80 + "\n")
     
-    analyzer = EIOPAAnalyzer()
+    analyzer = analyzer or EIOPAAnalyzer()
     
     if analyzer.historical_data.empty:
         print("⚠️ Pas d'historique disponible. Exécutez d'abord example_1 plusieurs fois.")
@@ -82,7 +86,7 @@ def example_2_historical_analysis():
         print(f"Moy : {format_rate_pct(ts['rate'].mean())}")
 
 
-def example_3_multi_maturity_comparison():
+def example_3_multi_maturity_comparison(analyzer: Optional[EIOPAAnalyzer] = None):
     """
     Exemple 3 : Comparaison de plusieurs maturités
     """
@@ -90,7 +94,7 @@ def example_3_multi_maturity_comparison():
     print("EXEMPLE 3 : Comparaison de maturités")
     print("=" * 80 + "\n")
     
-    analyzer = EIOPAAnalyzer()
+    analyzer = analyzer or EIOPAAnalyzer()
     
     if analyzer.historical_data.empty:
         print("⚠️ Pas d'historique disponible")
@@ -122,7 +126,7 @@ def example_3_multi_maturity_comparison():
     print(f"\n📐 Pente moyenne : {format_bps((rate_30y - rate_1y) / 29 * 10000)} par an")
 
 
-def example_4_custom_alerts():
+def example_4_custom_alerts(analyzer: Optional[EIOPAAnalyzer] = None):
     """
     Exemple 4 : Système d'alertes personnalisé
     """
@@ -130,7 +134,7 @@ def example_4_custom_alerts():
     print("EXEMPLE 4 : Alertes personnalisées")
     print("=" * 80 + "\n")
     
-    analyzer = EIOPAAnalyzer()
+    analyzer = analyzer or EIOPAAnalyzer()
     
     if len(analyzer.historical_data) < 2:
         print("⚠️ Pas assez de données pour la comparaison")
@@ -149,20 +153,15 @@ def example_4_custom_alerts():
     ALERT_THRESHOLD_CRITICAL = 100  # bps
     ALERT_THRESHOLD_WARNING = 50    # bps
     
-    alerts = []
+    # Variations des 2 dernières lignes, toutes maturités en une opération
+    tail = analyzer.historical_data[RATE_COLS].tail(2)
+    bps = tail.diff().iloc[-1].mul(BPS_CONVERSION).set_axis(TARGET_MATURITIES).dropna()
+    flagged = bps[bps.abs() >= ALERT_THRESHOLD_WARNING]
     
-    for maturity in [1, 5, 10, 20, 30]:
-        col = f'rate_{maturity}y'
-        
-        if pd.notna(latest[col]) and pd.notna(previous[col]):
-            change_bps = (latest[col] - previous[col]) * 10000
-            
-            if abs(change_bps) >= ALERT_THRESHOLD_CRITICAL:
-                level = "🔴 CRITIQUE"
-                alerts.append((level, maturity, change_bps))
-            elif abs(change_bps) >= ALERT_THRESHOLD_WARNING:
-                level = "🟠 ATTENTION"
-                alerts.append((level, maturity, change_bps))
+    alerts = [
+        ("🔴 CRITIQUE" if abs(change_bps) >= ALERT_THRESHOLD_CRITICAL else "🟠 ATTENTION", maturity, change_bps)
+        for maturity, change_bps in flagged.items()
+    ]
     
     if alerts:
         print("Alertes détectées :")
@@ -173,7 +172,7 @@ def example_4_custom_alerts():
         print("✅ Aucune alerte, variations normales")
 
 
-def example_5_export_to_excel():
+def example_5_export_to_excel(analyzer: Optional[EIOPAAnalyzer] = None):
     """
     Exemple 5 : Export Excel avancé avec formatting
     """
@@ -181,7 +180,7 @@ def example_5_export_to_excel():
     print("EXEMPLE 5 : Export Excel avancé")
     print("=" * 80 + "\n")
     
-    analyzer = EIOPAAnalyzer()
+    analyzer = analyzer or EIOPAAnalyzer()
     
     if analyzer.historical_data.empty:
         print("⚠️ Pas de données à exporter")
@@ -189,56 +188,64 @@ def example_5_export_to_excel():
     
     output_file = Path("data/eiopa_export_avance.xlsx")
     
+    # Feuille 1 : Données brutes (lecture seule, pas de copie)
+    df_raw = analyzer.historical_data
+    sheets = {'Données brutes': df_raw}
+    
+    # Feuille 2 : Taux 10Y uniquement
+    sheets['Taux 10Y'] = pd.DataFrame({
+        'Date': df_raw['reference_date'],
+        'Taux 10Y (%)': df_raw['rate_10y'] * 100,
+    })
+    
+    # Feuille 3 : Variations mensuelles
+    if len(df_raw) > 1:
+        df_variations = (df_raw[RATE_COLS].diff().iloc[1:] * BPS_CONVERSION).set_axis(
+            [f'Δ {maturity}Y (bps)' for maturity in TARGET_MATURITIES], axis=1
+        )
+        df_variations.insert(0, 'Date', df_raw['reference_date'].iloc[1:].values)
+        sheets['Variations'] = df_variations
+    
+    # xlsxwriter (écriture plus rapide) si disponible, sinon openpyxl
     try:
-        from openpyxl.styles import Font, PatternFill, Alignment
-        
-        with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-            # Feuille 1 : Données brutes
-            df_raw = analyzer.historical_data.copy()
-            df_raw.to_excel(writer, sheet_name='Données brutes', index=False)
-            
-            # Feuille 2 : Taux 10Y uniquement
-            df_10y = df_raw[['reference_date', 'rate_10y']].copy()
-            df_10y.columns = ['Date', 'Taux 10Y (%)']
-            df_10y['Taux 10Y (%)'] = df_10y['Taux 10Y (%)'] * 100
-            df_10y.to_excel(writer, sheet_name='Taux 10Y', index=False)
-            
-            # Feuille 3 : Variations mensuelles
-            if len(df_raw) > 1:
-                variations = []
-                for i in range(1, len(df_raw)):
-                    current = df_raw.iloc[i]
-                    previous = df_raw.iloc[i-1]
-                    
-                    row = {'Date': current['reference_date']}
-                    
-                    for maturity in [1, 5, 10, 20, 30]:
-                        col = f'rate_{maturity}y'
-                        if pd.notna(current[col]) and pd.notna(previous[col]):
-                            change = (current[col] - previous[col]) * 10000
-                            row[f'Δ {maturity}Y (bps)'] = change
-                    
-                    variations.append(row)
-                
-                df_variations = pd.DataFrame(variations)
-                df_variations.to_excel(writer, sheet_name='Variations', index=False)
+        import xlsxwriter  # noqa: F401
+        engine = 'xlsxwriter'
+    except ImportError:
+        engine = 'openpyxl'
+    
+    try:
+        with pd.ExcelWriter(output_file, engine=engine) as writer:
+            for sheet_name, df in sheets.items():
+                df.to_excel(writer, sheet_name=sheet_name, index=False)
             
             # Formatter les en-têtes
-            for sheet_name in writer.sheets:
-                ws = writer.sheets[sheet_name]
-                for cell in ws[1]:
-                    cell.font = Font(bold=True)
-                    cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-                    cell.font = Font(color="FFFFFF", bold=True)
-                    cell.alignment = Alignment(horizontal='center')
+            if engine == 'xlsxwriter':
+                header_fmt = writer.book.add_format(
+                    {'bold': True, 'bg_color': '#366092', 'font_color': 'white', 'align': 'center'}
+                )
+                for sheet_name, df in sheets.items():
+                    writer.sheets[sheet_name].write_row(0, 0, list(df.columns), header_fmt)
+            else:
+                from openpyxl.styles import Font, PatternFill, Alignment
+                
+                # Styles partagés par toutes les cellules d'en-tête
+                header_font = Font(color="FFFFFF", bold=True)
+                header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+                header_align = Alignment(horizontal='center')
+                for sheet_name in writer.sheets:
+                    ws = writer.sheets[sheet_name]
+                    for cell in ws[1]:
+                        cell.font = header_font
+                        cell.fill = header_fill
+                        cell.alignment = header_align
         
         print(f"✅ Fichier Excel créé : {output_file}")
         
     except ImportError:
-        print("⚠️ openpyxl non installé. Installation : pip install openpyxl")
+        print("⚠️ Aucun moteur Excel installé. Installation : pip install xlsxwriter")
 
 
-def example_6_calculate_duration():
+def example_6_calculate_duration(analyzer: Optional[EIOPAAnalyzer] = None):
     """
     Exemple 6 : Calcul de la duration d'une courbe
     """
@@ -246,7 +253,7 @@ def example_6_calculate_duration():
     print("EXEMPLE 6 : Calcul de duration")
     print("=" * 80 + "\n")
     
-    analyzer = EIOPAAnalyzer()
+    analyzer = analyzer or EIOPAAnalyzer()
     
     if analyzer.historical_data.empty:
         print("⚠️ Pas de données disponibles")
@@ -257,7 +264,7 @@ def example_6_calculate_duration():
     # Extraire les taux
     rates = {}
     for maturity in [1, 5, 10, 20, 30]:
-        col = f'rate_{maturity}y'
+        col = RATE_COL_INDEX[maturity]
         if pd.notna(latest[col]):
             rates[maturity] = float(latest[col])
     
@@ -278,29 +285,33 @@ def example_6_calculate_duration():
         30: 5    # 5M€ à 30 ans
     }
     
-    total_value = sum(portfolio.values())
-    weighted_duration = 0
+    mats = np.fromiter(sorted(portfolio), dtype=np.int32)
+    amts = np.fromiter((portfolio[m] for m in mats), dtype=np.float64, count=len(mats))
+    total_value = amts.sum()
+    weights = amts / total_value
+    
+    # Seules les maturités avec un taux disponible contribuent
+    available = np.fromiter((m in rates for m in mats), dtype=bool, count=len(mats))
+    mats, amts, weights = mats[available], amts[available], weights[available]
+    rts = np.fromiter((rates[m] for m in mats), dtype=np.float64, count=len(mats))
+    
+    # Duration simple (approximation)
+    durations = mats / (1.0 + rts)
+    weighted_duration = float(durations @ weights)
     
-    print(f"\nRépartition du portefeuille (Total : {total_value}M€) :")
+    print(f"\nRépartition du portefeuille (Total : {total_value:.0f}M€) :")
     print(f"{'Maturité':<10} | {'Montant':>10} | {'Taux':>8} | {'Duration*':>10}")
     print("-" * 50)
     
-    for maturity, amount in sorted(portfolio.items()):
-        if maturity in rates:
-            rate = rates[maturity]
-            # Duration simple (approximation)
-            duration = maturity / (1 + rate)
-            weight = amount / total_value
-            weighted_duration += duration * weight
-            
-            print(f"{maturity:2d} ans     | {amount:>7.0f}M€ | {rate*100:>6.2f}% | {duration:>8.2f}")
+    for maturity, amount, rate, duration in zip(mats, amts, rts, durations):
+        print(f"{maturity:2d} ans     | {amount:>7.0f}M€ | {rate*100:>6.2f}% | {duration:>8.2f}")
     
     print("-" * 50)
     print(f"\n📊 Duration moyenne du portefeuille : {weighted_duration:.2f} ans")
     print(f"   Sensibilité : -1% de taux → +{weighted_duration:.2f}% de valeur")
 
 
-def example_7_stress_testing():
+def example_7_stress_testing(analyzer: Optional[EIOPAAnalyzer] = None):
     """
     Exemple 7 : Stress testing (chocs de taux)
     """
@@ -308,7 +319,7 @@ def example_7_stress_testing():
     print("EXEMPLE 7 : Stress testing")
     print("=" * 80 + "\n")
     
-    analyzer = EIOPAAnalyzer()
+    analyzer = analyzer or EIOPAAnalyzer()
     
     if analyzer.historical_data.empty:
         print("⚠️ Pas de données disponibles")
@@ -316,60 +327,58 @@ def example_7_stress_testing():
     
     latest = analyzer.historical_data.iloc[-1]
     
-    # Scénarios de choc
-    scenarios = {
-        "Hausse parallèle +100bps": 0.01,
-        "Hausse parallèle +200bps": 0.02,
-        "Baisse parallèle -50bps": -0.005,
-        "Aplatissement (courte +50, longue -50)": None,  # Spécial
-        "Pentification (courte -50, longue +50)": None   # Spécial
-    }
+    # Scénarios de choc : une ligne par scénario, une colonne par maturité (1Y, 10Y, 30Y)
+    mats = np.array([1, 10, 30])
+    scenario_names = [
+        "Hausse parallèle +100bps",
+        "Hausse parallèle +200bps",
+        "Baisse parallèle -50bps",
+        "Aplatissement (courte +50, longue -50)",
+        "Pentification (courte -50, longue +50)",
+    ]
+    shocks = np.array([
+        [0.01, 0.01, 0.01],
+        [0.02, 0.02, 0.02],
+        [-0.005, -0.005, -0.005],
+        [0.005, -0.005, -0.005],
+        [-0.005, 0.005, 0.005],
+    ])
     
     print(f"Date de référence : {latest['reference_date'].strftime('%Y-%m-%d')}\n")
     print("Taux de base :")
     
-    base_rates = {}
-    for maturity in [1, 10, 30]:
-        col = f'rate_{maturity}y'
-        if pd.notna(latest[col]):
-            base_rates[maturity] = float(latest[col])
-            print(f"  {maturity:2d}Y : {format_rate_pct(base_rates[maturity])}")
+    base = latest[[RATE_COL_INDEX[m] for m in mats]].to_numpy(dtype=np.float64)
+    available = ~np.isnan(base)
+    for maturity, rate in zip(mats[available], base[available]):
+        print(f"  {maturity:2d}Y : {format_rate_pct(rate)}")
     
     print("\n" + "-" * 60)
     print("Scénarios de stress :")
     print("-" * 60)
     
-    for scenario_name, shock in scenarios.items():
+    # Tous les scénarios en une opération
+    mats, base, shocks = mats[available], base[available], shocks[:, available]
+    stressed = base + shocks
+    changes_bps = (stressed - base) * BPS_CONVERSION
+    
+    for scenario_name, stressed_row, change_row in zip(scenario_names, stressed, changes_bps):
         print(f"\n{scenario_name} :")
-        
-        for maturity in [1, 10, 30]:
-            if maturity in base_rates:
-                base = base_rates[maturity]
-                
-                if shock is not None:
-                    # Choc parallèle
-                    stressed = base + shock
-                else:
-                    # Chocs spéciaux
-                    if "Aplatissement" in scenario_name:
-                        stressed = base + 0.005 if maturity == 1 else base - 0.005
-                    else:  # Pentification
-                        stressed = base - 0.005 if maturity == 1 else base + 0.005
-                
-                change = (stressed - base) * 10000
-                print(f"  {maturity:2d}Y : {format_rate_pct(base)} → {format_rate_pct(stressed)} ({format_bps(change)})")
+        for maturity, base_rate, stressed_rate, change in zip(mats, base, stressed_row, change_row):
+            print(f"  {maturity:2d}Y : {format_rate_pct(base_rate)} → {format_rate_pct(stressed_rate)} ({format_bps(change)})")
 
 
 def run_all_examples():
     """Exécute tous les exemples"""
+    # Un seul chargement de l'historique, partagé par les exemples 2 à 7
+    analyzer = EIOPAAnalyzer()
     examples = [
         example_1_basic_usage,
-        example_2_historical_analysis,
-        example_3_multi_maturity_comparison,
-        example_4_custom_alerts,
-        example_5_export_to_excel,
-        example_6_calculate_duration,
-        example_7_stress_testing
+        partial(example_2_historical_analysis, analyzer),
+        partial(example_3_multi_maturity_comparison, analyzer),
+        partial(example_4_custom_alerts, analyzer),
+        partial(example_5_export_to_excel, analyzer),
+        partial(example_6_calculate_duration, analyzer),
+        partial(example_7_stress_testing, analyzer)
     ]
     
     print("\n" + "🚀" * 40)
@@ -1,13 +1,25 @@
 """
 Module d'analyse et de comparaison des données EIOPA
 """
+from collections import defaultdict, deque
+from dataclasses import dataclass
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Set, Tuple
 
+import numpy as np
 import pandas as pd
 
-from config import HISTORICAL_FILE, TARGET_MATURITIES, ALERT_THRESHOLD_MOM, ALERT_THRESHOLD_YTD
+from config import (
+    HISTORICAL_FILE,
+    TARGET_MATURITIES,
+    RATE_COLS,
+    RATE_COL_INDEX,
+    ALERT_THRESHOLD_MOM,
+    ALERT_THRESHOLD_YTD,
+    BPS_CONVERSION,
+)
 from src.utils import (
     setup_logging,
     get_previous_month_date,
@@ -18,37 +30,292 @@ from src.utils import (
 
 logger = setup_logging()
 
+_COLUMNS = ["reference_date", "country"] + RATE_COLS + ["va"]
+_COL_POS = {col: j for j, col in enumerate(_COLUMNS)}
+# Nombre d'observations récentes conservées en mémoire par pays (voir get_recent_series)
+_RECENT_MAXLEN = 400
+# Métadonnée Parquet : taille et mtime (ns) du CSV dont la copie est issue
+_PARQUET_CSV_KEY = b"eiopa_csv_key"
+
+
+@dataclass
+class LatestSnapshot:
+    """Dernière observation connue d'un pays (taux alignés sur TARGET_MATURITIES, NaN si absent)."""
+    date: pd.Timestamp
+    rates: np.ndarray
+    va: float
+
 
 class EIOPAAnalyzer:
     """Analyseur de données EIOPA avec historique persistant."""
 
     def __init__(self, historical_file: Path = HISTORICAL_FILE):
         self.historical_file = historical_file
-        self.historical_data = self._load_historical()
+        self.parquet_file = historical_file.with_suffix(".parquet")
+        # Lignes de l'historique (dicts) et index (pays, date) -> position dans _rows.
+        # Le DataFrame n'est matérialisé qu'à la demande (voir historical_data).
+        self._rows: List[Dict] = []
+        self._index: Dict[Tuple[str, pd.Timestamp], int] = {}
+        self._df: Optional[pd.DataFrame] = None
+        # Dates triées par pays (datetime64[ns]) pour les recherches de date la plus proche.
+        self._dates_by_country: Optional[Dict[str, np.ndarray]] = None
+        # Séries par pays : dates int64 triées et taux correspondants (n, len(TARGET_MATURITIES))
+        self._series_cache: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        # Disposition colonnaire alignée sur _rows : taux (N, len(TARGET_MATURITIES)) et VA (N,)
+        self._rates: Optional[np.ndarray] = None
+        self._va: Optional[np.ndarray] = None
+        # Suivi des écritures : lignes déjà présentes dans le CSV, date la plus récente écrite,
+        # positions modifiées depuis la dernière sauvegarde (les ajouts sont _rows[_saved_count:])
+        self._saved_count = 0
+        self._saved_max_date: Optional[pd.Timestamp] = None
+        self._dirty_updated_rows: Set[int] = set()
+        # Dernière observation par pays, tenue à jour au chargement et à chaque ajout
+        self._latest: Dict[str, LatestSnapshot] = {}
+        # Dernières observations par pays : deque de (date int64 ns, vecteur de taux),
+        # remplie à la demande puis alimentée à chaque ajout plus récent
+        self._recent: Dict[str, deque] = {}
+        self._recent_arrays: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        # Mémoïsation par instance, vidée à chaque mutation (voir _invalidate)
+        self._get_nearest_data = lru_cache(maxsize=256)(self._get_nearest_data)
+        self._analyze = lru_cache(maxsize=256)(self._analyze)
+        self._load_historical()
+
+    @property
+    def historical_data(self) -> pd.DataFrame:
+        """Historique sous forme de DataFrame trié par date, reconstruit après chaque mutation."""
+        if self._df is None:
+            self._df = self._build_dataframe()
+        return self._df
 
     # ------------------------------------------------------------------
     # Chargement / sauvegarde
     # ------------------------------------------------------------------
 
-    def _load_historical(self) -> pd.DataFrame:
-        if not self.historical_file.exists():
+    def _load_historical(self):
+        df = self._read_historical()
+        if df is None:
+            return
+        self._rows = df.to_dict("records")
+        self._index = {
+            (row["country"], pd.Timestamp(row["reference_date"])): i for i, row in enumerate(self._rows)
+        }
+        self._saved_count = len(self._rows)
+        self._saved_max_date = max((date for _, date in self._index), default=None)
+        for row in self._rows:
+            self._track_latest(row)
+        logger.info(f"Historique chargé : {len(self._rows)} enregistrements.")
+
+    def _read_historical(self) -> Optional[pd.DataFrame]:
+        """
+        Lit l'historique depuis la copie Parquet si elle a été générée à partir du CSV
+        actuel (source de vérité versionnée), sinon depuis le CSV.
+        """
+        csv_file, parquet_file = self.historical_file, self.parquet_file
+        if not csv_file.exists() and not parquet_file.exists():
             logger.info("Aucun historique existant — création d'un nouveau fichier.")
-            columns = ["reference_date", "country"] + [f"rate_{m}y" for m in TARGET_MATURITIES] + ["va"]
-            return pd.DataFrame(columns=columns)
+            return None
+
+        if parquet_file.exists() and (not csv_file.exists() or self._parquet_is_fresh()):
+            try:
+                return pd.read_parquet(parquet_file, engine="pyarrow")
+            except ImportError:
+                logger.warning("pyarrow non installé — lecture de l'historique CSV.")
+            except Exception as e:
+                logger.warning(f"Copie Parquet illisible ({e}) — lecture de l'historique CSV.")
+
+        if not csv_file.exists():
+            return None
+        df = self._read_csv()
+        if df is not None:
+            # Copie Parquet absente ou périmée (ajouts en fin de CSV) : reconstruite une fois au chargement
+            self._write_parquet(df)
+        return df
+
+    def _csv_key(self) -> bytes:
+        stat = self.historical_file.stat()
+        return f"{stat.st_size}:{stat.st_mtime_ns}".encode()
+
+    def _parquet_is_fresh(self) -> bool:
+        """
+        Vrai si la copie Parquet porte la clé du CSV actuel. Une simple comparaison de mtime
+        ne suffit pas (granularité du système de fichiers, copies qui conservent les dates).
+        """
         try:
-            df = pd.read_csv(self.historical_file, parse_dates=["reference_date"])
-            logger.info(f"Historique chargé : {len(df)} enregistrements.")
+            import pyarrow.parquet as pq
+            metadata = pq.read_schema(self.parquet_file).metadata or {}
+            return metadata.get(_PARQUET_CSV_KEY) == self._csv_key()
+        except Exception:
+            return False
+
+    def _read_csv(self) -> Optional[pd.DataFrame]:
+        """Lit le CSV historique (Polars si disponible, sinon pandas)."""
+        csv_file = self.historical_file
+        try:
+            import polars as pl
+            df = pl.read_csv(
+                csv_file,
+                schema_overrides={
+                    "reference_date": pl.Date,
+                    "country": pl.Utf8,
+                    **{col: pl.Float64 for col in RATE_COLS + ["va"]},
+                },
+            ).with_columns(pl.col("reference_date").cast(pl.Datetime("ns"))).to_pandas()
+            df["country"] = df["country"].astype("category")
             return df
+        except ImportError:
+            pass
+        except Exception as e:
+            logger.warning(f"Lecture Polars impossible ({e}) — lecture pandas.")
+        try:
+            return pd.read_csv(
+                csv_file,
+                parse_dates=["reference_date"],
+                date_format="%Y-%m-%d",
+                cache_dates=True,
+                dtype={"country": "category"},
+                engine="c",
+            )
         except Exception as e:
             logger.error(f"Erreur chargement historique : {e}")
-            return pd.DataFrame()
+            return None
+
+    def _build_dataframe(self) -> pd.DataFrame:
+        df = pd.DataFrame.from_records(self._rows, columns=_COLUMNS)
+        # Pays en catégorie : 1 octet par ligne et comparaisons sur les codes entiers
+        df["country"] = df["country"].astype("category")
+        if not df.empty:
+            df = df.sort_values("reference_date", kind="stable")
+        return df
+
+    def _invalidate(self, keep_frame: bool = False):
+        """Invalide les vues dérivées de _rows après une mutation."""
+        if not keep_frame:
+            self._df = None
+        self._dates_by_country = None
+        self._rates = None
+        self._va = None
+        self._clear_caches()
+
+    def _clear_caches(self):
+        self._series_cache = {}
+        self._recent_arrays = {}
+        self._get_nearest_data.cache_clear()
+        self._analyze.cache_clear()
+
+    def _update_views(self, idx: int, row: Dict):
+        """
+        Répercute en place la mise à jour de la ligne idx (clé et position inchangées)
+        sur les vues déjà matérialisées, au lieu de les reconstruire.
+        """
+        if self._df is not None:
+            self._df.iloc[self._df.index.get_loc(idx), [_COL_POS[c] for c in row]] = list(row.values())
+        if self._rates is not None:
+            self._rates[idx] = np.array([row[c] for c in RATE_COLS], dtype=np.float64)
+            self._va[idx] = np.nan if row["va"] is None else row["va"]
+        self._clear_caches()
+
+    def _append_view(self, idx: int, row: Dict) -> bool:
+        """
+        Ajoute en place la nouvelle ligne idx au DataFrame déjà matérialisé quand elle
+        ne casse pas le tri par date. Retourne False si le DataFrame doit être reconstruit.
+        """
+        df = self._df
+        if df is None or df.empty or row["reference_date"] < df["reference_date"].iloc[-1]:
+            return False
+        df.loc[idx] = [np.nan if row[c] is None else row[c] for c in _COLUMNS]
+        df["country"] = df["country"].astype("category")
+        return True
+
+    def _country_dates(self) -> Dict[str, np.ndarray]:
+        if self._dates_by_country is None:
+            by_country = defaultdict(list)
+            for country, date in self._index:
+                by_country[country].append(date)
+            self._dates_by_country = {
+                country: np.sort(np.array(dates, dtype="datetime64[ns]"))
+                for country, dates in by_country.items()
+            }
+        return self._dates_by_country
+
+    def _soa(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Construit (si besoin) les matrices de taux et de VA alignées sur _rows."""
+        if self._rates is None:
+            self._rates = np.array(
+                [[row.get(col) for col in RATE_COLS] for row in self._rows], dtype=np.float64
+            ).reshape(len(self._rows), len(RATE_COLS))
+            self._va = np.array([row.get("va") for row in self._rows], dtype=np.float64)
+        return self._rates, self._va
+
+    def _series(self, country: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Retourne (dates en int64 ns, matrice des taux) triées par date pour un pays."""
+        if country not in self._series_cache:
+            dates = self._country_dates().get(country, np.array([], dtype="datetime64[ns]"))
+            positions = [self._index[(country, pd.Timestamp(d))] for d in dates]
+            rates = self._soa()[0][positions].reshape(len(positions), len(TARGET_MATURITIES))
+            self._series_cache[country] = (dates.view("i8"), rates)
+        return self._series_cache[country]
 
     def save_historical(self):
+        """
+        Sauvegarde l'historique. Dans le cas courant (uniquement des dates postérieures
+        à celles déjà écrites), les nouvelles lignes sont ajoutées en fin de CSV ;
+        sinon le fichier est réécrit entièrement, avec sa copie Parquet.
+        """
+        new_rows = self._rows[self._saved_count:]
+        new_dates = [pd.Timestamp(row["reference_date"]) for row in new_rows]
+        append_only = (
+            new_rows
+            and not self._dirty_updated_rows
+            and self._saved_count > 0
+            and self.historical_file.exists()
+            and min(new_dates) >= self._saved_max_date
+        )
         try:
-            self.historical_data.to_csv(self.historical_file, index=False)
+            if append_only:
+                new_df = pd.DataFrame.from_records(new_rows, columns=_COLUMNS).sort_values("reference_date", kind="stable")
+                self._write_csv(new_df, append=True)
+            else:
+                df = self.historical_data
+                self._write_csv(df)
             logger.info(f"Historique sauvegardé : {self.historical_file}")
         except Exception as e:
             logger.error(f"Erreur sauvegarde : {e}")
+            return
+        self._saved_count = len(self._rows)
+        if new_dates:
+            self._saved_max_date = max(new_dates + ([self._saved_max_date] if self._saved_max_date is not None else []))
+        self._dirty_updated_rows.clear()
+
+        # En mode ajout, la clé du CSV change : la copie Parquet est reconstruite au
+        # prochain chargement ; pas de réécriture complète ici.
+        if not append_only:
+            self._write_parquet(df)
+
+    def _write_parquet(self, df: pd.DataFrame):
+        """Écrit la copie Parquet de l'historique, marquée avec la clé du CSV écrit juste avant."""
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            table = table.replace_schema_metadata(
+                {**(table.schema.metadata or {}), _PARQUET_CSV_KEY: self._csv_key()}
+            )
+            pq.write_table(table, self.parquet_file, compression="zstd")
+        except ImportError:
+            logger.debug("pyarrow non installé — copie Parquet non générée.")
+        except Exception as e:
+            logger.warning(f"Erreur sauvegarde Parquet : {e}")
+
+    def _write_csv(self, df: pd.DataFrame, append: bool = False):
+        """Écrit df dans le CSV historique (Polars si disponible, sinon pandas)."""
+        try:
+            import polars as pl
+        except ImportError:
+            df.to_csv(self.historical_file, mode="a" if append else "w", header=not append, index=False)
+            return
+        out = pl.from_pandas(df).with_columns(pl.col("reference_date").dt.date())
+        with open(self.historical_file, "a" if append else "w", newline="") as f:
+            out.write_csv(f, include_header=not append)
 
     # ------------------------------------------------------------------
     # Ajout / mise à jour
@@ -56,75 +323,105 @@ class EIOPAAnalyzer:
 
     def add_to_historical(self, data: Dict):
         """Ajoute ou met à jour une entrée dans l'historique."""
-        row = {"reference_date": data["reference_date"], "country": data["country"]}
+        self._upsert(data)
+        self.save_historical()
+        logger.info(f"Donnée ajoutée : {data['reference_date'].strftime('%Y-%m-%d')}")
+
+    def add_many(self, items: List[Dict]):
+        """Ajoute ou met à jour plusieurs entrées, avec une seule sauvegarde à la fin."""
+        for data in items:
+            self._upsert(data)
+        if items:
+            self.save_historical()
+        logger.info(f"{len(items)} entrée(s) ajoutée(s) à l'historique.")
+
+    def _upsert(self, data: Dict):
+        key = (data["country"], pd.Timestamp(data["reference_date"]))
+        row = {"reference_date": key[1], "country": data["country"]}
         for maturity in TARGET_MATURITIES:
-            row[f"rate_{maturity}y"] = data["rates"].get(maturity)
+            row[RATE_COL_INDEX[maturity]] = data["rates"].get(maturity)
         row["va"] = data.get("va")
 
-        if not self.historical_data.empty:
-            mask = (
-                (self.historical_data["reference_date"] == data["reference_date"])
-                & (self.historical_data["country"] == data["country"])
-            )
-            if mask.any():
-                for col, value in row.items():
-                    self.historical_data.loc[mask, col] = value
-                logger.info("Entrée existante mise à jour.")
-            else:
-                self.historical_data = pd.concat(
-                    [self.historical_data, pd.DataFrame([row])], ignore_index=True
-                )
+        idx = self._index.get(key)
+        if idx is not None:
+            self._rows[idx] = row
+            self._update_views(idx, row)
+            self._recent.pop(row["country"], None)
+            if idx < self._saved_count:
+                self._dirty_updated_rows.add(idx)
+            logger.info("Entrée existante mise à jour.")
         else:
-            self.historical_data = pd.DataFrame([row])
+            idx = len(self._rows)
+            self._index[key] = idx
+            self._rows.append(row)
+            self._invalidate(keep_frame=self._append_view(idx, row))
+            self._track_recent(row)
+        self._track_latest(row)
 
-        self.historical_data.sort_values("reference_date", inplace=True)
-        self.save_historical()
-        logger.info(f"Donnée ajoutée : {data['reference_date'].strftime('%Y-%m-%d')}")
+    def _track_recent(self, row: Dict):
+        """Ajoute row au tampon récent du pays, ou l'abandonne si row n'est pas la plus récente."""
+        recent = self._recent.get(row["country"])
+        if recent is None:
+            return
+        date_ns = pd.Timestamp(row["reference_date"]).value
+        if recent and date_ns < recent[-1][0]:
+            del self._recent[row["country"]]
+            return
+        recent.append((date_ns, np.array([row.get(col) for col in RATE_COLS], dtype=np.float64)))
+
+    def _track_latest(self, row: Dict):
+        """Met à jour la dernière observation du pays si row est au moins aussi récente."""
+        date = pd.Timestamp(row["reference_date"])
+        latest = self._latest.get(row["country"])
+        if latest is not None and date < latest.date:
+            return
+        va = row.get("va")
+        self._latest[row["country"]] = LatestSnapshot(
+            date=date,
+            rates=np.array([row.get(col) for col in RATE_COLS], dtype=np.float64),
+            va=np.nan if va is None else float(va),
+        )
 
     # ------------------------------------------------------------------
     # Récupération des données historiques
     # ------------------------------------------------------------------
 
-    def _row_to_dict(self, row: pd.Series) -> Dict:
-        """Convertit une ligne de l'historique en dictionnaire standard."""
-        rates = {}
-        for maturity in TARGET_MATURITIES:
-            col = f"rate_{maturity}y"
-            if col in row and pd.notna(row[col]):
-                rates[maturity] = float(row[col])
+    def _row_to_dict(self, i: int) -> Dict:
+        """Convertit la ligne i de l'historique en dictionnaire standard."""
+        rates_matrix, va_vector = self._soa()
+        rates = {m: float(v) for m, v in zip(TARGET_MATURITIES, rates_matrix[i]) if not np.isnan(v)}
+        va = va_vector[i]
         return {
-            "reference_date": row["reference_date"],
-            "country": row["country"],
+            "reference_date": self._rows[i]["reference_date"],
+            "country": self._rows[i]["country"],
             "rates": rates,
-            "va": float(row["va"]) if pd.notna(row.get("va")) else None,
+            "va": None if np.isnan(va) else float(va),
         }
 
+    def get_latest(self, country: str) -> Optional[LatestSnapshot]:
+        """Dernière observation disponible pour un pays, sans passer par le DataFrame."""
+        return self._latest.get(country)
+
     def get_historical_data(self, country: str, target_date: datetime) -> Optional[Dict]:
-        if self.historical_data.empty:
+        idx = self._index.get((country, pd.Timestamp(target_date)))
+        if idx is None:
             return None
-        mask = (
-            (self.historical_data["country"] == country)
-            & (self.historical_data["reference_date"] == target_date)
-        )
-        if not mask.any():
-            return None
-        return self._row_to_dict(self.historical_data[mask].iloc[0])
+        return self._row_to_dict(idx)
 
     def _get_nearest_data(self, country: str, target_date: datetime, tolerance_days: int) -> Optional[Dict]:
         """Récupère l'entrée la plus proche d'une date cible, dans une tolérance donnée."""
-        if self.historical_data.empty:
+        dates = self._country_dates().get(country)
+        if dates is None:
             return None
-        td = pd.Timedelta(days=tolerance_days)
-        mask = (
-            (self.historical_data["country"] == country)
-            & (self.historical_data["reference_date"] >= target_date - td)
-            & (self.historical_data["reference_date"] <= target_date + td)
-        )
-        if not mask.any():
+        target = np.datetime64(pd.Timestamp(target_date), "ns")
+        td = np.timedelta64(tolerance_days, "D")
+        lo = np.searchsorted(dates, target - td, side="left")
+        hi = np.searchsorted(dates, target + td, side="right")
+        if lo == hi:
             return None
-        candidates = self.historical_data[mask].copy()
-        candidates["_diff"] = (candidates["reference_date"] - target_date).abs()
-        return self._row_to_dict(candidates.sort_values("_diff").iloc[0])
+        window = dates[lo:hi].view("i8")
+        best = lo + int(np.argmin(np.abs(window - target.view("i8"))))
+        return self._row_to_dict(self._index[(country, pd.Timestamp(dates[best]))])
 
     def get_previous_month_data(self, current_date: datetime, country: str) -> Optional[Dict]:
         target = get_previous_month_date(current_date)
@@ -152,27 +449,70 @@ class EIOPAAnalyzer:
         end_date: Optional[datetime] = None,
     ) -> pd.DataFrame:
         """Retourne la série temporelle d'une maturité pour un pays."""
-        col = f"rate_{maturity}y"
-        if self.historical_data.empty or col not in self.historical_data.columns:
+        if maturity not in TARGET_MATURITIES:
             return pd.DataFrame(columns=["reference_date", "rate"])
 
-        df = self.historical_data[self.historical_data["country"] == country].copy()
-        if start_date:
-            df = df[df["reference_date"] >= start_date]
-        if end_date:
-            df = df[df["reference_date"] <= end_date]
+        dates, rates = self._series(country)
+        start_ns = pd.Timestamp(start_date).value if start_date else np.iinfo(np.int64).min
+        end_ns = pd.Timestamp(end_date).value if end_date else np.iinfo(np.int64).max - 1
+        lo, hi = np.searchsorted(dates, [start_ns, end_ns + 1])
+        d = dates[lo:hi]
+        r = rates[lo:hi, TARGET_MATURITIES.index(maturity)]
+        valid = ~np.isnan(r)
+        return pd.DataFrame({"reference_date": d[valid].view("datetime64[ns]"), "rate": r[valid]})
+
+    def _recent_series(self, country: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Retourne (dates int64 ns, matrice des taux) des dernières observations d'un pays."""
+        if country not in self._recent_arrays:
+            recent = self._recent.get(country)
+            if recent is None:
+                dates, rates = self._series(country)
+                recent = deque(zip(dates[-_RECENT_MAXLEN:].tolist(), rates[-_RECENT_MAXLEN:]), maxlen=_RECENT_MAXLEN)
+                self._recent[country] = recent
+            self._recent_arrays[country] = (
+                np.fromiter((d for d, _ in recent), dtype=np.int64, count=len(recent)),
+                np.array([r for _, r in recent], dtype=np.float64).reshape(len(recent), len(TARGET_MATURITIES)),
+            )
+        return self._recent_arrays[country]
+
+    def get_recent_series(self, country: str, maturity: int, days: int) -> pd.DataFrame:
+        """
+        Série d'une maturité sur les `days` derniers jours précédant la dernière observation
+        du pays, lue depuis le tampon des observations récentes (sans parcourir l'historique).
+        """
+        if maturity not in TARGET_MATURITIES:
+            return pd.DataFrame(columns=["reference_date", "rate"])
 
-        result = df[["reference_date", col]].rename(columns={col: "rate"}).dropna()
-        return result.sort_values("reference_date")
+        dates, rates = self._recent_series(country)
+        if not len(dates):
+            return pd.DataFrame(columns=["reference_date", "rate"])
+        lo = np.searchsorted(dates, dates[-1] - pd.Timedelta(days=days).value, side="left")
+        d = dates[lo:]
+        r = rates[lo:, TARGET_MATURITIES.index(maturity)]
+        valid = ~np.isnan(r)
+        return pd.DataFrame({"reference_date": d[valid].view("datetime64[ns]"), "rate": r[valid]})
 
     # ------------------------------------------------------------------
     # Analyse
     # ------------------------------------------------------------------
 
     def analyze(self, current_data: Dict) -> Dict:
-        """Analyse complète : taux courants + comparaisons M/M et YTD + alertes."""
-        reference_date = current_data["reference_date"]
-        country = current_data["country"]
+        """
+        Analyse complète : taux courants + comparaisons M/M et YTD + alertes.
+
+        Le résultat est mémoïsé par (pays, date, taux, VA) jusqu'à la prochaine
+        modification de l'historique : il est partagé entre appels et ne doit pas être modifié.
+        """
+        return self._analyze(
+            current_data["country"],
+            pd.Timestamp(current_data["reference_date"]).value,
+            tuple(sorted(current_data["rates"].items())),
+            current_data.get("va"),
+        )
+
+    def _analyze(self, country: str, reference_ns: int, rates_items: Tuple, va: Optional[float]) -> Dict:
+        reference_date = pd.Timestamp(reference_ns)
+        rates = dict(rates_items)
         logger.info(f"Analyse pour {country} — {reference_date.strftime('%Y-%m-%d')}")
 
         previous_data = self.get_previous_month_data(reference_date, country)
@@ -181,8 +521,8 @@ class EIOPAAnalyzer:
         summary = create_summary_dict(
             reference_date=reference_date,
             country=country,
-            rates=current_data["rates"],
-            va=current_data.get("va"),
+            rates=rates,
+            va=va,
             previous_rates=previous_data["rates"] if previous_data else None,
             previous_va=previous_data.get("va") if previous_data else None,
             ytd_rates=ytd_data["rates"] if ytd_data else None,
@@ -190,19 +530,30 @@ class EIOPAAnalyzer:
         )
         summary["previous_date"] = previous_data["reference_date"] if previous_data else None
         summary["ytd_date"] = ytd_data["reference_date"] if ytd_data else None
-        summary["alerts"] = self._detect_alerts(summary)
+
+        curr = self._rates_vector(rates)
+        mom_bps = (curr - self._rates_vector(previous_data["rates"])) * BPS_CONVERSION if previous_data else None
+        ytd_bps = (curr - self._rates_vector(ytd_data["rates"])) * BPS_CONVERSION if ytd_data else None
+        summary["alerts"] = self._detect_alerts(mom_bps, ytd_bps)
         return summary
 
-    def _detect_alerts(self, summary: Dict) -> List[str]:
-        alerts = []
-        for maturity, change_bps in summary["changes_mom"].items():
-            if maturity != "va" and abs(change_bps) >= ALERT_THRESHOLD_MOM:
-                direction = "hausse" if change_bps > 0 else "baisse"
-                alerts.append(f"⚠️ Variation M/M importante ({maturity}Y) : {direction} de {format_bps(change_bps)}")
+    @staticmethod
+    def _rates_vector(rates: Dict[int, float]) -> np.ndarray:
+        """Aligne un dictionnaire de taux sur TARGET_MATURITIES (NaN si absent)."""
+        return np.array([rates.get(m, np.nan) for m in TARGET_MATURITIES], dtype=np.float64)
 
-        for maturity, change_bps in summary["changes_ytd"].items():
-            if maturity != "va" and abs(change_bps) >= ALERT_THRESHOLD_YTD:
+    def _detect_alerts(self, mom_bps: Optional[np.ndarray], ytd_bps: Optional[np.ndarray]) -> List[str]:
+        alerts = []
+        for label, changes, threshold in (
+            ("M/M", mom_bps, ALERT_THRESHOLD_MOM),
+            ("YTD", ytd_bps, ALERT_THRESHOLD_YTD),
+        ):
+            if changes is None:
+                continue
+            for j in np.flatnonzero(np.abs(changes) >= threshold):
+                change_bps = float(changes[j])
                 direction = "hausse" if change_bps > 0 else "baisse"
-                alerts.append(f"⚠️ Variation YTD importante ({maturity}Y) : {direction} de {format_bps(change_bps)}")
-
-        return alerts
\ No newline at end of file
+                alerts.append(
+                    f"⚠️ Variation {label} importante ({TARGET_MATURITIES[j]}Y) : {direction} de {format_bps(change_bps)}"
+                )
+        return alerts
@@ -1,22 +1,36 @@
 """
 Module de téléchargement des fichiers EIOPA
 """
+import bisect
+import json
+import logging
+import os
 import re
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
 from pathlib import Path
-from typing import Optional, List, Tuple
+from typing import BinaryIO, Optional, List, Set, Tuple, Dict
 from datetime import datetime
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+import lxml.html
 
 from config import (
-    EIOPA_RFR_URL, ZIP_DOWNLOAD_PATTERN,
-    REQUEST_TIMEOUT, MAX_RETRIES, HEADERS, RAW_DIR
+    EIOPA_BASE_URL, EIOPA_RFR_URL, ZIP_DOWNLOAD_PATTERN,
+    REQUEST_TIMEOUT, MAX_RETRIES, MAX_PARALLEL_DOWNLOADS, HEADERS, RAW_DIR,
+    LISTING_CACHE_FILE, LISTING_CACHE_TTL, DOWNLOAD_VALIDATORS_FILE
 )
 from src.utils import setup_logging, parse_date_from_filename
 
 logger = setup_logging()
 
+# Liens de téléchargement des archives RFR, filtrés directement par libxml2
+RFR_LINKS_XPATH = f"//a[contains(@href,'{ZIP_DOWNLOAD_PATTERN}') and contains(@href,'EIOPA_RFR_')]/@href"
+# Nom d'archive RFR (EIOPA_RFR_AAAAMMJJ...) dans le paramètre filename du lien
+_HREF_RE = re.compile(r'filename=(EIOPA_RFR_\d{8}[^&"]*)')
+
 
 class EIOPADownloader:
     """Gestionnaire de téléchargement des fichiers EIOPA"""
@@ -24,19 +38,133 @@ class EIOPADownloader:
     def __init__(self):
         self.session = requests.Session()
         self.session.headers.update(HEADERS)
+        # Connexions keep-alive réutilisées entre la page de liste et les archives,
+        # pool dimensionné pour les téléchargements parallèles (download_many)
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=MAX_PARALLEL_DOWNLOADS)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        
+        # Dernière liste récupérée et validateurs HTTP associés (requêtes conditionnelles)
+        self._cache_path = LISTING_CACHE_FILE
+        self._etag: Optional[str] = None
+        self._last_modified: Optional[str] = None
+        self._cached_files: Optional[List[Tuple[str, str, datetime]]] = None
+        self._cached_at = 0.0
+        self._load_listing_cache()
+        
+        # Validateurs HTTP des archives déjà téléchargées (fichier JSON indexé par URL)
+        # et archives dont le serveur a confirmé qu'elles n'ont pas changé (304)
+        self._validators_path = DOWNLOAD_VALIDATORS_FILE
+        self._validators: Dict[str, Dict[str, str]] = self._load_validators()
+        self._validators_lock = threading.Lock()
+        self.unchanged_files: Set[Path] = set()
+    
+    def _load_listing_cache(self):
+        """Charge la liste mise en cache lors d'une exécution précédente"""
+        if not self._cache_path.exists():
+            return
+        try:
+            with open(self._cache_path, 'rb') as f:
+                blob = f.read()
+            try:
+                import orjson
+                cache = orjson.loads(blob)
+            except ImportError:
+                cache = json.loads(blob)
+            self._cached_files = [
+                (filename, url, datetime.fromisoformat(date)) for filename, url, date in cache['files']
+            ]
+            self._etag = cache.get('etag')
+            self._last_modified = cache.get('last_modified')
+            self._cached_at = cache.get('fetched_at', 0.0)
+        except Exception as e:
+            logger.warning(f"Cache de la liste des fichiers illisible: {e}")
+    
+    def _save_listing_cache(self):
+        """Écrit la liste et ses validateurs en JSON (écriture atomique via os.replace)"""
+        cache = {
+            'files': [(filename, url, date.isoformat()) for filename, url, date in self._cached_files],
+            'etag': self._etag,
+            'last_modified': self._last_modified,
+            'fetched_at': self._cached_at,
+        }
+        tmp_path = self._cache_path.with_suffix('.tmp')
+        try:
+            try:
+                import orjson
+                blob = orjson.dumps(cache)
+            except ImportError:
+                blob = json.dumps(cache).encode('utf-8')
+            with open(tmp_path, 'wb') as f:
+                f.write(blob)
+            os.replace(tmp_path, self._cache_path)
+        except Exception as e:
+            logger.warning(f"Impossible d'écrire le cache de la liste des fichiers: {e}")
+    
+    def _load_validators(self) -> Dict[str, Dict[str, str]]:
+        if not self._validators_path.exists():
+            return {}
+        try:
+            with open(self._validators_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"Validateurs de téléchargement illisibles: {e}")
+            return {}
+    
+    def _store_validators(self, url: str, response: requests.Response):
+        """Mémorise ETag / Last-Modified de l'archive (écriture atomique via os.replace)"""
+        validators = {
+            key: response.headers[header]
+            for key, header in (('etag', 'ETag'), ('last_modified', 'Last-Modified'))
+            if header in response.headers
+        }
+        with self._validators_lock:
+            if validators:
+                self._validators[url] = validators
+            else:
+                self._validators.pop(url, None)
+            tmp_path = self._validators_path.with_suffix('.tmp')
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(self._validators, f, indent=2)
+                os.replace(tmp_path, self._validators_path)
+            except Exception as e:
+                logger.warning(f"Impossible d'écrire les validateurs de téléchargement: {e}")
     
-    def get_available_files(self) -> List[Tuple[str, str, datetime]]:
+    def get_available_files(self, limit: Optional[int] = None) -> List[Tuple[str, str, datetime]]:
         """
         Récupère la liste des fichiers disponibles sur le site EIOPA
         
+        La liste précédente est réutilisée si le serveur répond 304 (ETag / Last-Modified),
+        ou, faute de validateurs, tant qu'elle a moins de LISTING_CACHE_TTL secondes.
+        
+        Args:
+            limit: Nombre maximal de fichiers retournés (les plus récents), tous si None
+            
         Returns:
-            Liste de tuples (nom_fichier, url, date)
+            Liste de tuples (nom_fichier, url, date), du plus récent au plus ancien
         """
+        has_validators = bool(self._etag or self._last_modified)
+        if (
+            self._cached_files is not None
+            and not has_validators
+            and time.time() - self._cached_at < LISTING_CACHE_TTL
+        ):
+            logger.info(f"Liste des fichiers réutilisée depuis le cache ({len(self._cached_files)} fichiers)")
+            return self._cached_files[:limit]
+        
         logger.info(f"Récupération de la liste des fichiers depuis {EIOPA_RFR_URL}")
         
+        headers = {}
+        if self._cached_files is not None:
+            if self._etag:
+                headers['If-None-Match'] = self._etag
+            if self._last_modified:
+                headers['If-Modified-Since'] = self._last_modified
+        
         for attempt in range(MAX_RETRIES):
             try:
-                response = self.session.get(EIOPA_RFR_URL, timeout=REQUEST_TIMEOUT)
+                response = self.session.get(EIOPA_RFR_URL, headers=headers, timeout=REQUEST_TIMEOUT)
                 response.raise_for_status()
                 break
             except requests.RequestException as e:
@@ -47,35 +175,45 @@ class EIOPADownloader:
                     logger.error("Échec de connexion après toutes les tentatives")
                     raise
         
-        soup = BeautifulSoup(response.content, 'html.parser')
+        if response.status_code == 304:
+            logger.info(f"Liste des fichiers inchangée (304) — {len(self._cached_files)} fichiers en cache")
+            self._cached_at = time.time()
+            return self._cached_files[:limit]
+        
+        doc = lxml.html.fromstring(response.content)
         
-        # Rechercher tous les liens de téléchargement
+        # Liens de téléchargement de fichiers ZIP RFR uniquement
         files = []
-        for link in soup.find_all('a', href=True):
-            href = link['href']
+        for href in doc.xpath(RFR_LINKS_XPATH):
+            # Extraire le nom du fichier depuis le paramètre filename
+            filename_match = _HREF_RE.search(href)
+            if not filename_match:
+                continue
+            filename = filename_match.group(1)
+            
+            # Parser la date
+            file_date = parse_date_from_filename(filename)
+            if not file_date:
+                continue
+            
+            # Construire l'URL complète
+            if not href.startswith('http'):
+                href = f"{EIOPA_BASE_URL}{href}"
             
-            # Vérifier si c'est un lien de téléchargement de fichier ZIP RFR
-            if ZIP_DOWNLOAD_PATTERN in href and 'EIOPA_RFR_' in href:
-                # Extraire le nom du fichier depuis le paramètre filename
-                filename_match = re.search(r'filename=([^&]+)', href)
-                if filename_match:
-                    filename = filename_match.group(1)
-                    
-                    # Parser la date
-                    file_date = parse_date_from_filename(filename)
-                    if file_date:
-                        # Construire l'URL complète
-                        if not href.startswith('http'):
-                            href = f"https://www.eiopa.europa.eu{href}"
-                        
-                        files.append((filename, href, file_date))
-                        logger.debug(f"Fichier trouvé: {filename} - {file_date}")
+            files.append((filename, href, file_date))
+        logger.debug(f"Fichiers trouvés: {[f[0] for f in files]}")
         
         # Trier par date décroissante
         files.sort(key=lambda x: x[2], reverse=True)
         
+        self._cached_files = files
+        self._etag = response.headers.get('ETag')
+        self._last_modified = response.headers.get('Last-Modified')
+        self._cached_at = time.time()
+        self._save_listing_cache()
+        
         logger.info(f"{len(files)} fichiers RFR trouvés")
-        return files
+        return files[:limit]
     
     def get_latest_file(self) -> Optional[Tuple[str, str, datetime]]:
         """
@@ -84,7 +222,7 @@ class EIOPADownloader:
         Returns:
             Tuple (nom_fichier, url, date) ou None
         """
-        files = self.get_available_files()
+        files = self.get_available_files(limit=1)
         
         if not files:
             logger.warning("Aucun fichier trouvé")
@@ -94,30 +232,45 @@ class EIOPADownloader:
         logger.info(f"Dernier fichier disponible: {latest[0]} ({latest[2].strftime('%Y-%m-%d')})")
         return latest
     
-    def get_file_by_date(self, target_date: datetime) -> Optional[Tuple[str, str, datetime]]:
+    def get_file_by_date(
+        self,
+        target_date: datetime,
+        files: Optional[List[Tuple[str, str, datetime]]] = None
+    ) -> Optional[Tuple[str, str, datetime]]:
         """
         Récupère un fichier pour une date spécifique
         
         Args:
             target_date: Date cible
+            files: Liste déjà récupérée via get_available_files (sinon elle est téléchargée)
             
         Returns:
             Tuple (nom_fichier, url, date) ou None
         """
-        files = self.get_available_files()
+        if files is None:
+            files = self.get_available_files()
+        
+        # Liste triée par date décroissante : recherche dichotomique sur les dates croissantes,
+        # seuls les deux voisins de la date cible sont candidats
+        dates_asc = [f[2] for f in reversed(files)]
+        n = len(dates_asc)
+        pos = bisect.bisect_right(dates_asc, target_date)
+        candidates = []
+        if pos < n:
+            # À date égale, le premier fichier de la liste (dernier en ordre croissant)
+            candidates.append(files[n - bisect.bisect_right(dates_asc, dates_asc[pos])])
+        if pos > 0:
+            candidates.append(files[n - pos])
         
-        # Chercher une correspondance exacte ou le fichier le plus proche
         exact_match = None
         closest_match = None
-        min_diff = float('inf')
-        
-        for filename, url, file_date in files:
+        min_diff = None
+        for filename, url, file_date in candidates:
             if file_date.date() == target_date.date():
                 exact_match = (filename, url, file_date)
                 break
-            
             diff = abs((file_date - target_date).days)
-            if diff < min_diff:
+            if min_diff is None or diff < min_diff:
                 min_diff = diff
                 closest_match = (filename, url, file_date)
         
@@ -134,47 +287,60 @@ class EIOPADownloader:
             logger.error(f"Aucun fichier trouvé pour la date {target_date.strftime('%Y-%m-%d')}")
             return None
     
-    def download_file(self, url: str, filename: str, output_dir: Path = RAW_DIR) -> Optional[Path]:
+    def download_file(
+        self,
+        url: str,
+        filename: str,
+        output_dir: Path = RAW_DIR,
+        force: bool = False
+    ) -> Optional[Path]:
         """
         Télécharge un fichier depuis l'URL
         
+        Si l'archive existe déjà et que ses validateurs (ETag / Last-Modified) sont connus,
+        une requête conditionnelle est envoyée : sur 304 le fichier local est réutilisé et
+        ajouté à unchanged_files. Sans validateurs, le fichier local est réutilisé tel quel.
+        
         Args:
             url: URL du fichier
             filename: Nom du fichier
             output_dir: Dossier de sortie
+            force: Re-télécharger sans requête conditionnelle
             
         Returns:
             Chemin du fichier téléchargé ou None
         """
         output_path = output_dir / filename
         
-        # Vérifier si le fichier existe déjà
-        if output_path.exists():
-            logger.info(f"Fichier déjà téléchargé: {output_path}")
-            return output_path
+        headers = {}
+        if output_path.exists() and not force:
+            validators = self._validators.get(url)
+            if not validators:
+                logger.info(f"Fichier déjà téléchargé: {output_path}")
+                return output_path
+            if 'etag' in validators:
+                headers['If-None-Match'] = validators['etag']
+            if 'last_modified' in validators:
+                headers['If-Modified-Since'] = validators['last_modified']
         
         logger.info(f"Téléchargement de {filename}...")
         
+        # Écriture dans un fichier temporaire : l'archive existante reste intacte en cas d'échec
+        tmp_path = output_path.with_name(output_path.name + '.part')
         for attempt in range(MAX_RETRIES):
             try:
-                response = self.session.get(url, timeout=REQUEST_TIMEOUT, stream=True)
-                response.raise_for_status()
+                response = self._open(url, headers)
+                if response.status_code == 304:
+                    response.close()
+                    logger.info(f"Fichier inchangé sur le serveur (304): {output_path}")
+                    self.unchanged_files.add(output_path)
+                    return output_path
                 
-                # Télécharger par chunks
-                total_size = int(response.headers.get('content-length', 0))
-                downloaded_size = 0
-                
-                with open(output_path, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        if chunk:
-                            f.write(chunk)
-                            downloaded_size += len(chunk)
-                            
-                            # Afficher progression (tous les 10%)
-                            if total_size > 0:
-                                progress = (downloaded_size / total_size) * 100
-                                if progress % 10 < 1:
-                                    logger.debug(f"Progression: {progress:.0f}%")
+                with open(tmp_path, 'wb') as f:
+                    self._stream_to(response, f)
+                os.replace(tmp_path, output_path)
+                self.unchanged_files.discard(output_path)
+                self._store_validators(url, response)
                 
                 logger.info(f"Téléchargement réussi: {output_path}")
                 return output_path
@@ -185,16 +351,77 @@ class EIOPADownloader:
                     time.sleep(2 ** attempt)
                 else:
                     logger.error("Échec du téléchargement après toutes les tentatives")
-                    if output_path.exists():
-                        output_path.unlink()  # Supprimer le fichier partiel
+                    if tmp_path.exists():
+                        tmp_path.unlink()  # Supprimer le fichier partiel
+                    raise
+        
+        return None
+    
+    def download_file_to_memory(self, url: str) -> Optional[BytesIO]:
+        """
+        Télécharge un fichier en mémoire, sans écriture disque
+        
+        Pour les appelants qui n'ont pas besoin d'archiver le ZIP dans RAW_DIR :
+        le tampon retourné peut être passé directement à EIOPAProcessor.
+        
+        Args:
+            url: URL du fichier
+            
+        Returns:
+            Tampon positionné au début ou None
+        """
+        buffer = BytesIO()
+        for attempt in range(MAX_RETRIES):
+            try:
+                buffer.seek(0)
+                buffer.truncate()
+                self._stream_to(self._open(url), buffer)
+                buffer.seek(0)
+                logger.info(f"Téléchargement en mémoire réussi ({buffer.getbuffer().nbytes} octets)")
+                return buffer
+                
+            except requests.RequestException as e:
+                logger.warning(f"Tentative {attempt + 1}/{MAX_RETRIES} échouée: {e}")
+                if attempt < MAX_RETRIES - 1:
+                    time.sleep(2 ** attempt)
+                else:
+                    logger.error("Échec du téléchargement après toutes les tentatives")
                     raise
         
         return None
     
-    def download_latest(self) -> Optional[Path]:
+    def _open(self, url: str, headers: Optional[Dict[str, str]] = None) -> requests.Response:
+        """Ouvre la réponse en streaming (lève une exception sur erreur HTTP)"""
+        response = self.session.get(url, headers=headers, timeout=REQUEST_TIMEOUT, stream=True)
+        response.raise_for_status()
+        return response
+    
+    def _stream_to(self, response: requests.Response, fileobj: BinaryIO):
+        """Écrit le contenu de la réponse dans fileobj par blocs de 64 Kio"""
+        total_size = int(response.headers.get('content-length', 0))
+        downloaded_size = 0
+        
+        # Progression tous les 10%, seulement si le niveau DEBUG est actif
+        log_progress = total_size > 0 and logger.isEnabledFor(logging.DEBUG)
+        step = max(total_size // 10, 1)
+        next_threshold = step
+        
+        for chunk in response.iter_content(chunk_size=65536):
+            if chunk:
+                fileobj.write(chunk)
+                downloaded_size += len(chunk)
+                
+                if log_progress and downloaded_size >= next_threshold:
+                    logger.debug(f"Progression: {downloaded_size * 100 // total_size}%")
+                    next_threshold += step
+    
+    def download_latest(self, force: bool = False) -> Optional[Path]:
         """
         Télécharge le dernier fichier disponible
         
+        Args:
+            force: Re-télécharger sans requête conditionnelle
+        
         Returns:
             Chemin du fichier téléchargé ou None
         """
@@ -204,14 +431,15 @@ class EIOPADownloader:
             return None
         
         filename, url, file_date = latest
-        return self.download_file(url, filename)
+        return self.download_file(url, filename, force=force)
     
-    def download_by_date(self, target_date: datetime) -> Optional[Path]:
+    def download_by_date(self, target_date: datetime, force: bool = False) -> Optional[Path]:
         """
         Télécharge le fichier pour une date spécifique
         
         Args:
             target_date: Date cible
+            force: Re-télécharger sans requête conditionnelle
             
         Returns:
             Chemin du fichier téléchargé ou None
@@ -222,7 +450,45 @@ class EIOPADownloader:
             return None
         
         filename, url, file_date = file_info
-        return self.download_file(url, filename)
+        return self.download_file(url, filename, force=force)
+    
+    def download_files(self, files: List[Tuple[str, str]]) -> Dict[str, Optional[Path]]:
+        """
+        Télécharge plusieurs fichiers en parallèle sur la session partagée
+        
+        Args:
+            files: Liste de tuples (nom_fichier, url)
+            
+        Returns:
+            Dictionnaire nom_fichier -> chemin téléchargé (None en cas d'échec)
+        """
+        def fetch(item: Tuple[str, str]) -> Optional[Path]:
+            filename, url = item
+            try:
+                return self.download_file(url, filename)
+            except Exception as e:
+                logger.error(f"Échec du téléchargement de {filename}: {e}")
+                return None
+        
+        with ThreadPoolExecutor(max_workers=MAX_PARALLEL_DOWNLOADS) as executor:
+            paths = list(executor.map(fetch, files))
+        return {filename: path for (filename, _), path in zip(files, paths)}
+    
+    def download_many(self, dates: List[datetime]) -> Dict[datetime, Optional[Path]]:
+        """
+        Télécharge les fichiers de plusieurs dates (une seule récupération de la liste)
+        
+        Args:
+            dates: Dates cibles
+            
+        Returns:
+            Dictionnaire date cible -> chemin téléchargé (None si introuvable ou en échec)
+        """
+        available = self.get_available_files()
+        matches = {d: self.get_file_by_date(d, files=available) for d in dates}
+        to_fetch = list({(m[0], m[1]) for m in matches.values() if m})
+        paths = self.download_files(to_fetch)
+        return {d: paths.get(m[0]) if m else None for d, m in matches.items()}
 
 
 def main():
@@ -230,7 +496,7 @@ def main():
     downloader = EIOPADownloader()
     
     # Afficher les 5 derniers fichiers disponibles
-    files = downloader.get_available_files()[:5]
+    files = downloader.get_available_files(limit=5)
     print("\n=== 5 derniers fichiers disponibles ===")
     for filename, url, date in files:
         print(f"  - {filename}: {date.strftime('%Y-%m-%d')}")
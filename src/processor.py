@@ -2,74 +2,138 @@
 Module de traitement et extraction des données EIOPA
 """
 import fnmatch
+import re
+import shutil
 import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
 
 import pandas as pd
 
-from config import EXPECTED_EXCEL_FILES, EXCEL_SHEET_RFR, EXTRACTS_DIR, TARGET_COUNTRY, TARGET_MATURITIES, PROCESSED_DIR
-from src.rfr_exporter import export_rfr_csv
-from src.utils import setup_logging, parse_date_from_filename, safe_float_conversion, validate_rate
+from config import (
+    EXPECTED_EXCEL_FILES, EXCEL_SHEET_RFR, EXTRACTS_DIR, TARGET_COUNTRY, TARGET_MATURITIES, PROCESSED_DIR,
+    RATES_CACHE_DIR,
+)
+from src.rfr_exporter import SHEET_NO_VA_BASE, export_rfr_csv
+from src.utils import (
+    setup_logging,
+    find_country_column,
+    open_workbook,
+    parse_date_from_filename,
+    read_country_sheet,
+    safe_float_series,
+    validate_rate_array,
+)
 
 logger = setup_logging()
 
+# Maturités cibles, construites une fois pour toutes les archives traitées
+_TARGET_IDX = pd.Index(TARGET_MATURITIES)
+
+# Motifs EXPECTED_EXCEL_FILES compilés une fois, par ordre de priorité ("*motif" couvre aussi "motif")
+_EXCEL_PATTERNS = [re.compile(fnmatch.translate(f"*{pattern}")) for pattern in EXPECTED_EXCEL_FILES]
+
 
 class EIOPAProcessor:
     """Traite un fichier ZIP EIOPA : extraction Excel, taux cibles et export CSV complets."""
 
-    def __init__(self, zip_path: Path):
+    def __init__(self, zip_path: Union[Path, BinaryIO], filename: Optional[str] = None):
+        """
+        zip_path : chemin du ZIP, ou ZIP en mémoire (voir EIOPADownloader.download_file_to_memory) ;
+        dans ce cas filename (nom d'origine de l'archive) est requis pour la date de référence.
+        """
         self.zip_path = zip_path
-        self.reference_date = parse_date_from_filename(zip_path.name)
+        self.zip_name = filename or zip_path.name
+        self.reference_date = parse_date_from_filename(self.zip_name)
         if not self.reference_date:
-            logger.warning(f"Impossible d'extraire la date de : {zip_path.name}")
+            logger.warning(f"Impossible d'extraire la date de : {self.zip_name}")
+        self._zf: Optional[zipfile.ZipFile] = None
+        self._namelist: Optional[List[str]] = None
 
     # ------------------------------------------------------------------
     # ZIP
     # ------------------------------------------------------------------
 
+    def _open_zip(self) -> zipfile.ZipFile:
+        """Archive ouverte une seule fois par instance (répertoire central lu une fois), voir close()."""
+        if self._zf is None:
+            self._zf = zipfile.ZipFile(self.zip_path, "r")
+        return self._zf
+
+    def close(self):
+        """Ferme l'archive si elle a été ouverte."""
+        if self._zf is not None:
+            self._zf.close()
+            self._zf = None
+
     def list_files_in_zip(self) -> List[str]:
-        try:
-            with zipfile.ZipFile(self.zip_path, "r") as zf:
-                return zf.namelist()
-        except zipfile.BadZipFile as e:
-            logger.error(f"Fichier ZIP corrompu : {e}")
-            return []
+        """Contenu du ZIP, lu une seule fois par instance."""
+        if self._namelist is None:
+            try:
+                self._namelist = self._open_zip().namelist()
+            except zipfile.BadZipFile as e:
+                logger.error(f"Fichier ZIP corrompu : {e}")
+                return []
+        return self._namelist
 
     def find_excel_file(self) -> Optional[str]:
         """Trouve le fichier Excel Term Structures dans le ZIP."""
-        files = self.list_files_in_zip()
-        for pattern in EXPECTED_EXCEL_FILES:
-            for filename in files:
-                if filename.lower().endswith((".xlsx", ".xls")) and (
-                    fnmatch.fnmatch(filename, pattern) or fnmatch.fnmatch(filename, f"*{pattern}")
-                ):
+        excel_files = [f for f in self.list_files_in_zip() if f.lower().endswith((".xlsx", ".xls"))]
+        for regex in _EXCEL_PATTERNS:
+            for filename in excel_files:
+                if regex.match(filename):
                     logger.info(f"Fichier Excel trouvé : {filename}")
                     return filename
         logger.warning(f"Aucun fichier Excel trouvé pour les patterns : {EXPECTED_EXCEL_FILES}")
         return None
 
     def extract_excel_from_zip(self, excel_filename: str) -> Optional[Path]:
-        """Extrait le fichier Excel du ZIP vers PROCESSED_DIR."""
+        """
+        Extrait le fichier Excel du ZIP vers EXTRACTS_DIR. Un fichier déjà extrait de même
+        taille et plus récent que l'archive est réutilisé (onglets lus alors servis par le
+        cache de utils.read_excel_sheet).
+        """
         try:
             output_path = EXTRACTS_DIR / Path(excel_filename).name
-            with zipfile.ZipFile(self.zip_path, "r") as zf:
-                with zf.open(excel_filename) as src, open(output_path, "wb") as dst:
-                    dst.write(src.read())
+            zf = self._open_zip()
+            if self._is_extracted(output_path, zf.getinfo(excel_filename).file_size):
+                logger.info(f"Fichier Excel déjà extrait : {output_path}")
+                return output_path
+            with zf.open(excel_filename) as src, open(output_path, "wb") as dst:
+                shutil.copyfileobj(src, dst, length=1024 * 1024)  # par blocs de 1 Mio
             logger.info(f"Fichier Excel extrait : {output_path}")
             return output_path
         except Exception as e:
             logger.error(f"Erreur extraction : {e}")
             return None
 
+    def read_excel_from_zip(self, excel_filename: str) -> Optional[BinaryIO]:
+        """Charge le fichier Excel du ZIP en mémoire (sans écriture sur disque)."""
+        try:
+            with self._open_zip().open(excel_filename) as src:
+                return BytesIO(src.read())
+        except Exception as e:
+            logger.error(f"Erreur lecture {excel_filename} dans le ZIP : {e}")
+            return None
+
+    def _is_extracted(self, output_path: Path, expected_size: int) -> bool:
+        if not isinstance(self.zip_path, Path) or not output_path.exists():
+            return False
+        stat = output_path.stat()
+        return stat.st_size == expected_size and stat.st_mtime_ns >= self.zip_path.stat().st_mtime_ns
+
     # ------------------------------------------------------------------
     # Lecture Excel
     # ------------------------------------------------------------------
 
-    def _read_sheet(self, excel_path: Path, sheet_name: str) -> Optional[pd.DataFrame]:
-        """Lit un onglet EIOPA (header ligne 2, index maturité colonne 2)."""
+    def _read_sheet(
+        self, excel_path: Union[Path, pd.ExcelFile], sheet_name: str, country_code: str = TARGET_COUNTRY
+    ) -> Optional[pd.DataFrame]:
+        """Lit un onglet EIOPA (header ligne 2, index maturité colonne 2), colonne pays seule si connue."""
         try:
-            df = pd.read_excel(excel_path, sheet_name=sheet_name, engine="openpyxl", header=1, index_col=1)
+            df = read_country_sheet(excel_path, sheet_name, country_code)
             if df.empty:
                 logger.warning(f"Onglet '{sheet_name}' vide.")
                 return None
@@ -84,40 +148,29 @@ class EIOPAProcessor:
 
     def extract_country_rates(self, df: pd.DataFrame, country_code: str = TARGET_COUNTRY) -> Optional[Dict[int, float]]:
         """Extrait les taux TARGET_MATURITIES pour un pays depuis le DataFrame pivot."""
-        country_aliases = {
-            "FR": ["France", "French", "FR"],
-            "DE": ["Germany", "German", "DE"],
-            "IT": ["Italy", "Italian", "IT"],
-            "ES": ["Spain", "Spanish", "ES"],
-            "EUR": ["Euro", "EUR", "Eurozone"],
-            "GB": ["United Kingdom", "UK", "GB", "GBP"],
-            "US": ["United States", "USA", "US", "USD"],
-        }
-        country_column = None
-        for name in country_aliases.get(country_code, [country_code]):
-            for col in df.columns:
-                if name.lower() in str(col).lower():
-                    country_column = col
-                    break
-            if country_column:
-                break
-
+        country_column = find_country_column(tuple(df.columns), country_code)
         if country_column is None:
             logger.error(f"Colonne pays '{country_code}' introuvable. Colonnes : {list(df.columns[:10])}")
             return None
 
-        rates = {}
-        for maturity in TARGET_MATURITIES:
-            mask = df.index == maturity
-            if not mask.any():
-                logger.warning(f"Maturité {maturity} non trouvée.")
-                continue
-            value = safe_float_conversion(df.loc[mask, country_column].iloc[0])
-            if value is not None and validate_rate(value):
-                rates[maturity] = value
-            elif value is not None:
-                logger.warning(f"Taux invalide pour maturité {maturity}Y : {value}")
+        # Une seule sélection pour toutes les maturités (première occurrence de chaque maturité)
+        series = df[country_column]
+        series = series[series.index.isin(_TARGET_IDX)]
+        series = series[~series.index.duplicated()]
+        found = series.reindex(_TARGET_IDX)
+        present = _TARGET_IDX.isin(series.index)
+
+        # Conversion et validation vectorisées (mêmes règles que safe_float_conversion / validate_rate)
+        values = safe_float_series(found)
+        valid = validate_rate_array(values.to_numpy())
+        invalid = values.notna().to_numpy() & ~valid
 
+        if not present.all():
+            logger.warning(f"Maturité(s) non trouvée(s) : {list(_TARGET_IDX[~present])}")
+        for maturity, value in values[invalid].items():
+            logger.warning(f"Taux invalide pour maturité {maturity}Y : {value}")
+
+        rates = {int(m): float(v) for m, v in values[valid].items()}
         if not rates:
             logger.error("Aucun taux extrait.")
             return None
@@ -136,17 +189,111 @@ class EIOPAProcessor:
 
         Retourne un dictionnaire avec les taux et les chemins des CSV générés.
         """
-        logger.info(f"Traitement : {self.zip_path.name}")
+        logger.info(f"Traitement : {self.zip_name}")
+
+        cached = self._load_cached_result()
+        if cached is not None:
+            logger.info(f"Taux déjà extraits pour cette archive ({len(cached['rates'])}) — Excel non relu.")
+            return cached
+
+        try:
+            excel_filename = self.find_excel_file()
+            if not excel_filename:
+                return None
 
-        excel_filename = self.find_excel_file()
-        if not excel_filename:
+            # Archive sur disque : Excel extrait (conservé, et clé du cache d'onglets) ;
+            # archive en mémoire : Excel lu directement, sans passage par le disque
+            if isinstance(self.zip_path, Path):
+                excel_source = self.extract_excel_from_zip(excel_filename)
+            else:
+                excel_source = self.read_excel_from_zip(excel_filename)
+            if not excel_source:
+                return None
+        finally:
+            self.close()
+
+        # Classeur ouvert une seule fois pour tous les onglets lus (taux cibles et export CSV)
+        try:
+            book = open_workbook(excel_source)
+        except Exception as e:
+            logger.error(f"Classeur illisible {Path(excel_filename).name} : {e}")
             return None
+        with book:
+            result = self._process_workbook(book)
+        if result:
+            self._save_cached_rates(result["rates"])
+        return result
+
+    # ------------------------------------------------------------------
+    # Cache des taux extraits (Parquet, dans RATES_CACHE_DIR, hors des exports)
+    # ------------------------------------------------------------------
 
-        excel_path = self.extract_excel_from_zip(excel_filename)
-        if not excel_path:
+    def _csv_paths(self) -> Tuple[Path, Path]:
+        date_str = self.reference_date.strftime("%Y%m%d")
+        return PROCESSED_DIR / f"RFR_{date_str}_NO_VA.csv", PROCESSED_DIR / f"RFR_{date_str}_WITH_VA.csv"
+
+    def _rates_cache_file(self) -> Optional[Path]:
+        """Fichier de cache des taux cibles, seulement pour une archive sur disque datée."""
+        if not isinstance(self.zip_path, Path) or not self.reference_date:
+            return None
+        return RATES_CACHE_DIR / f"RFR_{self.reference_date:%Y%m%d}_{TARGET_COUNTRY}_RATES.parquet"
+
+    def _load_cached_result(self) -> Optional[Dict]:
+        """
+        Résultat reconstruit depuis le cache si celui-ci est plus récent que l'archive, porte
+        sur les mêmes TARGET_MATURITIES et que les deux CSV exportés sont présents.
+        """
+        cache = self._rates_cache_file()
+        if cache is None:
+            return None
+        no_va_path, with_va_path = self._csv_paths()
+        try:
+            if not (
+                cache.exists()
+                and cache.stat().st_mtime_ns >= self.zip_path.stat().st_mtime_ns
+                and no_va_path.exists()
+                and with_va_path.exists()
+            ):
+                return None
+            df = pd.read_parquet(cache, engine="pyarrow")
+        except ImportError:
+            return None
+        except Exception as e:
+            logger.warning(f"Cache des taux illisible ({e}) — retraitement de l'archive.")
+            return None
+        if df["maturity"].tolist() != TARGET_MATURITIES:
+            return None
+
+        df = df.dropna(subset=["rate"])
+        rates = dict(zip(df["maturity"].astype(int).tolist(), df["rate"].astype(float).tolist()))
+        if not rates:
             return None
+        return {
+            "reference_date": self.reference_date,
+            "country": TARGET_COUNTRY,
+            "rates": rates,
+            "va": None,
+            "source_file": self.zip_name,
+            "rfr_no_va_csv": no_va_path,
+            "rfr_with_va_csv": with_va_path,
+        }
+
+    def _save_cached_rates(self, rates: Dict[int, float]):
+        cache = self._rates_cache_file()
+        if cache is None:
+            return
+        # Toutes les maturités cibles, NaN si absente, pour détecter un changement de config
+        df = pd.DataFrame({"maturity": TARGET_MATURITIES, "rate": [rates.get(m) for m in TARGET_MATURITIES]})
+        try:
+            cache.parent.mkdir(parents=True, exist_ok=True)
+            df.to_parquet(cache, engine="pyarrow", compression="zstd", index=False)
+        except ImportError:
+            logger.debug("pyarrow non installé — cache des taux non écrit.")
+        except Exception as e:
+            logger.warning(f"Erreur écriture cache des taux : {e}")
 
-        df = self._read_sheet(excel_path, EXCEL_SHEET_RFR)
+    def _process_workbook(self, book: pd.ExcelFile) -> Optional[Dict]:
+        df = self._read_sheet(book, EXCEL_SHEET_RFR, TARGET_COUNTRY)
         if df is None:
             return None
 
@@ -159,16 +306,17 @@ class EIOPAProcessor:
             "country": TARGET_COUNTRY,
             "rates": rates,
             "va": None,
-            "source_file": self.zip_path.name,
+            "source_file": self.zip_name,
         }
 
-        # Export CSV complets (maturités 0–150)
+        # Export CSV complets (maturités 0–150), l'onglet sans VA déjà lu est réutilisé
         date_str = self.reference_date.strftime("%Y%m%d")
         no_va_path, with_va_path = export_rfr_csv(
-            excel_path=excel_path,
+            excel_path=book,
             reference_date_str=date_str,
             country_code=TARGET_COUNTRY,
             output_dir=PROCESSED_DIR,
+            no_va_df=df if EXCEL_SHEET_RFR == SHEET_NO_VA_BASE else None,
         )
         result["rfr_no_va_csv"]   = no_va_path
         result["rfr_with_va_csv"] = with_va_path
@@ -179,4 +327,32 @@ class EIOPAProcessor:
         if with_va_path:
             logger.info(f"CSV WITH_VA : {with_va_path.name}")
 
-        return result
\ No newline at end of file
+        return result
+
+
+# ------------------------------------------------------------------
+# Traitement par lot
+# ------------------------------------------------------------------
+
+def _process_one(zip_path: Path) -> Tuple[Optional[Dict], Optional[str]]:
+    """Traite une archive dans un processus de travail : (résultat, message d'erreur)."""
+    try:
+        result = EIOPAProcessor(zip_path).process()
+        return result, None if result else "Échec du traitement"
+    except Exception as e:
+        logger.error(f"Erreur traitement {zip_path.name} : {e}")
+        return None, str(e)
+
+
+def process_many(
+    zip_paths: List[Path], max_workers: Optional[int] = None
+) -> Iterator[Tuple[Optional[Dict], Optional[str]]]:
+    """
+    Traite plusieurs archives en parallèle (un processus par cœur, la lecture Excel étant
+    limitée par le CPU). Les résultats sont produits dans l'ordre de zip_paths, au fil de l'eau.
+    """
+    if len(zip_paths) <= 1:
+        yield from map(_process_one, zip_paths)
+        return
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        yield from executor.map(_process_one, zip_paths)
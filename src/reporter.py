@@ -1,55 +1,69 @@
 """
 Module de génération de rapports EIOPA
 """
+import csv
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
 from datetime import datetime
 
-from config import LATEST_REPORT_FILE
+from config import LATEST_REPORT_FILE, RATE_COL_INDEX
 from src.utils import setup_logging, format_bps, format_rate_pct
 
 logger = setup_logging()
 
+# Blocs statiques du rapport texte
+_RULE = "=" * 80
+_SEP = "-" * 80
+_HEADER = (_RULE, "RAPPORT MENSUEL EIOPA - TAUX SANS RISQUE ET VOLATILITY ADJUSTMENT", _RULE, "")
+
+
+def _section(title: str) -> Tuple[str, str, str, str]:
+    """En-tête de section : titre encadré de séparateurs, suivi d'une ligne vide."""
+    return (_SEP, title, _SEP, "")
+
 
 class EIOPAReporter:
     """Générateur de rapports d'analyse EIOPA"""
     
     @staticmethod
-    def generate_text_report(analysis: Dict, output_file: Optional[Path] = None) -> str:
+    def generate_text_report(
+        analysis: Dict, output_file: Optional[Path] = None, return_text: bool = True
+    ) -> Optional[str]:
         """
         Génère un rapport texte formaté
         
         Args:
             analysis: Résultat de l'analyse (analyzer.analyze())
             output_file: Fichier de sortie (optionnel)
+            return_text: Assembler et retourner le texte ; à False avec output_file,
+                         les lignes sont écrites directement dans le fichier
             
         Returns:
-            Texte du rapport
+            Texte du rapport (None si return_text est False)
         """
         lines = []
         
+        # Maturités triées une fois ; les variations portent sur un sous-ensemble de ces maturités
+        maturities = sorted(analysis['rates'])
+        
         # En-tête
-        lines.append("=" * 80)
-        lines.append("RAPPORT MENSUEL EIOPA - TAUX SANS RISQUE ET VOLATILITY ADJUSTMENT")
-        lines.append("=" * 80)
-        lines.append("")
+        lines.extend(_HEADER)
         
         # Informations générales
         ref_date = analysis['reference_date']
-        lines.append(f"📅 Date d'analyse : {ref_date.strftime('%d/%m/%Y')}")
-        lines.append(f"🌍 Pays           : {analysis['country']}")
-        lines.append(f"📦 Source         : {analysis.get('source_file', 'N/A')}")
-        lines.append("")
+        lines.extend((
+            f"📅 Date d'analyse : {ref_date.strftime('%d/%m/%Y')}",
+            f"🌍 Pays           : {analysis['country']}",
+            f"📦 Source         : {analysis.get('source_file', 'N/A')}",
+            "",
+        ))
         
         # Section : Données extraites
-        lines.append("-" * 80)
-        lines.append("📊 DONNÉES EXTRAITES")
-        lines.append("-" * 80)
-        lines.append("")
+        lines.extend(_section("📊 DONNÉES EXTRAITES"))
         
         # Courbe des taux
         lines.append("Courbe des taux sans risque (EUR):")
-        for maturity in sorted(analysis['rates'].keys()):
+        for maturity in maturities:
             rate = analysis['rates'][maturity]
             lines.append(f"  • Taux {maturity:2d}Y : {format_rate_pct(rate)}")
         
@@ -65,10 +79,7 @@ class EIOPAReporter:
         
         # Section : Métadonnées techniques
         if analysis.get('metadata'):
-            lines.append("-" * 80)
-            lines.append("🔧 MÉTADONNÉES TECHNIQUES")
-            lines.append("-" * 80)
-            lines.append("")
+            lines.extend(_section("🔧 MÉTADONNÉES TECHNIQUES"))
             
             metadata = analysis['metadata']
             
@@ -94,18 +105,16 @@ class EIOPAReporter:
         
         # Section : Évolutions M/M
         if analysis['changes_mom'] and analysis.get('previous_date'):
-            lines.append("-" * 80)
-            lines.append("📈 ÉVOLUTIONS vs MOIS PRÉCÉDENT")
-            lines.append("-" * 80)
-            lines.append("")
+            lines.extend(_section("📈 ÉVOLUTIONS vs MOIS PRÉCÉDENT"))
             
             prev_date = analysis['previous_date']
             lines.append(f"Référence : {prev_date.strftime('%d/%m/%Y')}")
             lines.append("")
             
             lines.append("Variation des taux (en points de base):")
-            for maturity in sorted([k for k in analysis['changes_mom'].keys() if k != 'va']):
-                change = analysis['changes_mom'][maturity]
+            changes = analysis['changes_mom']
+            for maturity in (m for m in maturities if m in changes):
+                change = changes[maturity]
                 indicator = "🔴" if abs(change) >= 50 else "🟢"
                 lines.append(f"  {indicator} Taux {maturity:2d}Y : {format_bps(change)}")
             
@@ -117,18 +126,16 @@ class EIOPAReporter:
         
         # Section : Évolutions YTD
         if analysis['changes_ytd'] and analysis.get('ytd_date'):
-            lines.append("-" * 80)
-            lines.append("📆 ÉVOLUTIONS DEPUIS DÉBUT D'ANNÉE (YTD)")
-            lines.append("-" * 80)
-            lines.append("")
+            lines.extend(_section("📆 ÉVOLUTIONS DEPUIS DÉBUT D'ANNÉE (YTD)"))
             
             ytd_date = analysis['ytd_date']
             lines.append(f"Référence : {ytd_date.strftime('%d/%m/%Y')}")
             lines.append("")
             
             lines.append("Variation des taux (en points de base):")
-            for maturity in sorted([k for k in analysis['changes_ytd'].keys() if k != 'va']):
-                change = analysis['changes_ytd'][maturity]
+            changes = analysis['changes_ytd']
+            for maturity in (m for m in maturities if m in changes):
+                change = changes[maturity]
                 indicator = "🔴" if abs(change) >= 100 else "🟢"
                 lines.append(f"  {indicator} Taux {maturity:2d}Y : {format_bps(change)}")
             
@@ -140,35 +147,35 @@ class EIOPAReporter:
         
         # Section : Alertes
         if analysis.get('alerts'):
-            lines.append("-" * 80)
-            lines.append("⚠️  ALERTES")
-            lines.append("-" * 80)
-            lines.append("")
+            lines.extend(_section("⚠️  ALERTES"))
             
             for alert in analysis['alerts']:
                 lines.append(f"  {alert}")
             
             lines.append("")
         else:
-            lines.append("-" * 80)
-            lines.append("✅ Aucune variation anormale détectée")
-            lines.append("-" * 80)
-            lines.append("")
+            lines.extend(_section("✅ Aucune variation anormale détectée"))
         
         # Pied de page
-        lines.append("=" * 80)
-        lines.append(f"Rapport généré le {datetime.now().strftime('%d/%m/%Y à %H:%M:%S')}")
-        lines.append("Source : EIOPA Risk-Free Interest Rate Term Structures")
-        lines.append("=" * 80)
+        lines.extend((
+            _RULE,
+            f"Rapport généré le {datetime.now().strftime('%d/%m/%Y à %H:%M:%S')}",
+            "Source : EIOPA Risk-Free Interest Rate Term Structures",
+            _RULE,
+        ))
         
-        report_text = "\n".join(lines)
+        report_text = "\n".join(lines) if return_text else None
         
         # Sauvegarder dans un fichier si spécifié
         if output_file:
             try:
                 output_file.parent.mkdir(parents=True, exist_ok=True)
                 with open(output_file, 'w', encoding='utf-8') as f:
-                    f.write(report_text)
+                    if report_text is not None:
+                        f.write(report_text)
+                    else:
+                        # Lignes écrites une à une, sans copie intermédiaire du rapport complet
+                        print(*lines, sep="\n", end="", file=f)
                 logger.info(f"Rapport sauvegardé : {output_file}")
             except Exception as e:
                 logger.error(f"Erreur lors de la sauvegarde du rapport : {e}")
@@ -184,53 +191,38 @@ class EIOPAReporter:
             analysis: Résultat de l'analyse
             output_file: Fichier de sortie CSV
         """
-        import pandas as pd
-        
-        rows = []
-        
-        ref_date_str = analysis['reference_date'].strftime('%Y-%m-%d')
-        
-        # Lignes de taux
-        for maturity in sorted(analysis['rates'].keys()):
-            row = {
-                'reference_date': ref_date_str,
-                'country': analysis['country'],
-                'type': f'rate_{maturity}y',
-                'value': analysis['rates'][maturity],
-                'value_pct': analysis['rates'][maturity] * 100
-            }
-            
-            # Ajouter les variations si disponibles
-            if maturity in analysis['changes_mom']:
-                row['change_mom_bps'] = analysis['changes_mom'][maturity]
-            
-            if maturity in analysis['changes_ytd']:
-                row['change_ytd_bps'] = analysis['changes_ytd'][maturity]
-            
-            rows.append(row)
+        # Construction par colonnes (une liste par champ) plutôt qu'un dict par ligne
+        keys = sorted(analysis['rates'].keys())
+        types = [RATE_COL_INDEX.get(maturity, f'rate_{maturity}y') for maturity in keys]
+        values = [analysis['rates'][maturity] for maturity in keys]
         
         # Ligne VA
         if analysis.get('va') is not None:
-            row = {
-                'reference_date': ref_date_str,
-                'country': analysis['country'],
-                'type': 'va',
-                'value': analysis['va'],
-                'value_pct': analysis['va'] * 100
-            }
-            
-            if 'va' in analysis['changes_mom']:
-                row['change_mom_bps'] = analysis['changes_mom']['va']
-            
-            if 'va' in analysis['changes_ytd']:
-                row['change_ytd_bps'] = analysis['changes_ytd']['va']
-            
-            rows.append(row)
+            keys.append('va')
+            types.append('va')
+            values.append(analysis['va'])
         
-        df = pd.DataFrame(rows)
+        n = len(keys)
+        columns = {
+            'reference_date': [analysis['reference_date'].strftime('%Y-%m-%d')] * n,
+            'country': [analysis['country']] * n,
+            'type': types,
+            'value': values,
+            'value_pct': [value * 100 for value in values],
+        }
         
+        # Ajouter les variations si disponibles
+        for column, changes in (('change_mom_bps', analysis['changes_mom']),
+                                ('change_ytd_bps', analysis['changes_ytd'])):
+            if any(key in changes for key in keys):
+                columns[column] = [changes.get(key) for key in keys]
+        
+        # Écriture directe (quelques lignes : pas besoin de passer par un DataFrame)
         try:
-            df.to_csv(output_file, index=False)
+            with open(output_file, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f, lineterminator='\n')
+                writer.writerow(columns.keys())
+                writer.writerows(zip(*columns.values()))
             logger.info(f"Rapport CSV sauvegardé : {output_file}")
         except Exception as e:
             logger.error(f"Erreur lors de la sauvegarde CSV : {e}")
@@ -246,8 +238,15 @@ class EIOPAReporter:
         """
         import pandas as pd
         
+        # xlsxwriter (écriture seule, plus rapide) si installé, sinon openpyxl
+        try:
+            import xlsxwriter  # noqa: F401
+            engine = 'xlsxwriter'
+        except ImportError:
+            engine = 'openpyxl'
+        
         try:
-            with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
+            with pd.ExcelWriter(output_file, engine=engine) as writer:
                 # Feuille 1 : Taux actuels
                 rates_data = []
                 for maturity in sorted(analysis['rates'].keys()):
@@ -354,7 +353,7 @@ def main():
     
     # Texte
     text_file = LATEST_REPORT_FILE
-    reporter.generate_text_report(analysis, text_file)
+    reporter.generate_text_report(analysis, text_file, return_text=False)
     print(f"\n✓ Rapport texte sauvegardé : {text_file}")
     
     # CSV
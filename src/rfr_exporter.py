@@ -17,12 +17,12 @@ Formules EIOPA :
 """
 
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Optional, Tuple, Union
 import pandas as pd
 import numpy as np
 
 from config import TARGET_COUNTRY, PROCESSED_DIR
-from src.utils import setup_logging
+from src.utils import setup_logging, find_country_column, read_country_sheet, read_excel_sheet
 
 logger = setup_logging()
 
@@ -49,30 +49,19 @@ EXPECTED_MATURITIES = list(range(0, 151))
 
 def _find_country_column(df: pd.DataFrame, country_code: str) -> Optional[str]:
     """Localise la colonne pays dans un DataFrame pivot EIOPA."""
-    country_aliases = {
-        "FR": ["france", "french", "fr"],
-        "DE": ["germany", "german", "de"],
-        "IT": ["italy", "italian", "it"],
-        "ES": ["spain", "spanish", "es"],
-        "EUR": ["euro", "eur", "eurozone"],
-        "GB": ["united kingdom", "uk", "gb", "gbp"],
-        "US": ["united states", "usa", "us", "usd"],
-    }
-    targets = country_aliases.get(country_code.upper(), [country_code.lower()])
-    for col in df.columns:
-        if any(alias in str(col).lower() for alias in targets):
-            return col
+    col = find_country_column(tuple(df.columns), country_code)
+    if col is not None:
+        return col
     logger.error(f"Colonne pays '{country_code}' introuvable. Colonnes : {list(df.columns[:15])}")
     return None
 
 
-def _read_base_sheet(excel_path: Path, sheet_name: str) -> Optional[pd.DataFrame]:
-    """Lit un onglet base EIOPA (header ligne 2, index maturité colonne 2)."""
+def _read_base_sheet(
+    excel_path: Union[Path, pd.ExcelFile], sheet_name: str, country_code: str = TARGET_COUNTRY
+) -> Optional[pd.DataFrame]:
+    """Lit un onglet base EIOPA (header ligne 2, index maturité colonne 2), colonne pays seule si connue."""
     try:
-        df = pd.read_excel(
-            excel_path, sheet_name=sheet_name,
-            engine="openpyxl", header=1, index_col=1,
-        )
+        df = read_country_sheet(excel_path, sheet_name, country_code)
         if df.empty:
             logger.warning(f"Onglet '{sheet_name}' vide.")
             return None
@@ -83,16 +72,13 @@ def _read_base_sheet(excel_path: Path, sheet_name: str) -> Optional[pd.DataFrame
         return None
 
 
-def _read_shocks(excel_path: Path) -> Optional[pd.DataFrame]:
+def _read_shocks(excel_path: Union[Path, pd.ExcelFile]) -> Optional[pd.DataFrame]:
     """
     Lit l'onglet Shocks et retourne un DataFrame indexé par maturité (int)
     avec colonnes 'up' et 'down'.
     """
     try:
-        df = pd.read_excel(
-            excel_path, sheet_name=SHEET_SHOCKS,
-            engine="openpyxl", header=None, skiprows=SHOCKS_SKIPROWS,
-        )
+        df = read_excel_sheet(excel_path, SHEET_SHOCKS, header=None, skiprows=SHOCKS_SKIPROWS)
         shocks = pd.DataFrame({
             "maturity": pd.to_numeric(df.iloc[:, SHOCKS_MATURITY_COL], errors="coerce"),
             "up":       pd.to_numeric(df.iloc[:, SHOCKS_UP_COL],       errors="coerce"),
@@ -161,24 +147,28 @@ def _build_output_df(
 # ---------------------------------------------------------------------------
 
 def export_rfr_csv(
-    excel_path: Path,
+    excel_path: Union[Path, pd.ExcelFile],
     reference_date_str: str,
     country_code: str = TARGET_COUNTRY,
     output_dir: Path = PROCESSED_DIR,
+    no_va_df: Optional[pd.DataFrame] = None,
 ) -> Tuple[Optional[Path], Optional[Path]]:
     """
     Génère RFR_[DATE]_NO_VA.csv et RFR_[DATE]_WITH_VA.csv.
 
     Parameters
     ----------
-    excel_path : Path
-        Fichier Excel extrait du ZIP EIOPA.
+    excel_path : Path ou pd.ExcelFile
+        Fichier Excel extrait du ZIP EIOPA, ou classeur déjà ouvert (voir utils.open_workbook).
     reference_date_str : str
         Date au format YYYYMMDD.
     country_code : str
         Code pays (config.TARGET_COUNTRY).
     output_dir : Path
         Dossier de destination.
+    no_va_df : pd.DataFrame, optionnel
+        Onglet RFR_spot_no_VA déjà lu par l'appelant (header ligne 2, index maturité),
+        réutilisé au lieu d'être relu.
 
     Returns
     -------
@@ -201,6 +191,7 @@ def export_rfr_csv(
         label="NO_VA",
         reference_date_str=reference_date_str,
         output_dir=output_dir,
+        df_base=no_va_df,
     )
 
     with_va_path = _export_bloc(
@@ -217,16 +208,18 @@ def export_rfr_csv(
 
 
 def _export_bloc(
-    excel_path: Path,
+    excel_path: Union[Path, pd.ExcelFile],
     sheet_base: str,
     shocks: pd.DataFrame,
     country_code: str,
     label: str,
     reference_date_str: str,
     output_dir: Path,
+    df_base: Optional[pd.DataFrame] = None,
 ) -> Optional[Path]:
-    """Lit l'onglet base, recalcule les chocs, écrit le CSV."""
-    df_base = _read_base_sheet(excel_path, sheet_base)
+    """Lit l'onglet base (sauf si df_base est fourni), recalcule les chocs, écrit le CSV."""
+    if df_base is None:
+        df_base = _read_base_sheet(excel_path, sheet_base, country_code)
     if df_base is None:
         logger.error(f"[{label}] Onglet base manquant.")
         return None
@@ -1,24 +1,40 @@
 """
 Fonctions utilitaires pour le système de monitoring EIOPA
 """
+import atexit
+import calendar
 import logging
+import os
+import queue
 import re
-from datetime import datetime, timedelta
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
-from typing import Dict, Optional
+from typing import BinaryIO, Dict, Hashable, List, Optional, Tuple, Union
 
+import numpy as np
 import pandas as pd
 
-from config import LOG_FORMAT, LOG_DATE_FORMAT, LOG_FILE, MIN_RATE, MAX_RATE
+from config import (
+    LOG_FORMAT, LOG_DATE_FORMAT, MIN_RATE, MAX_RATE, COUNTRY_ALIASES,
+    ensure_dirs, get_log_file,
+)
 
 
-def setup_logging(log_file: Path = LOG_FILE) -> logging.Logger:
+@lru_cache(maxsize=4)
+def setup_logging(log_file: Optional[Path] = None) -> logging.Logger:
+    """Logger EIOPA_Monitor (fichier mensuel + console), configuré une fois puis mémoïsé."""
     logger = logging.getLogger("EIOPA_Monitor")
     logger.setLevel(logging.INFO)
 
     if logger.handlers:
         return logger
 
+    ensure_dirs()
+    if log_file is None:
+        log_file = get_log_file()
     fmt = logging.Formatter(LOG_FORMAT, LOG_DATE_FORMAT)
 
     fh = logging.FileHandler(log_file, encoding="utf-8")
@@ -29,19 +45,159 @@ def setup_logging(log_file: Path = LOG_FILE) -> logging.Logger:
     ch.setLevel(logging.INFO)
     ch.setFormatter(fmt)
 
-    logger.addHandler(fh)
-    logger.addHandler(ch)
+    # Écriture (fichier + console) déléguée à un thread : les appels logger.* ne font qu'empiler
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, fh, ch, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    logger.addHandler(QueueHandler(log_queue))
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=lambda: _log_directly(logger, fh, ch))
     return logger
 
 
+def _log_directly(logger: logging.Logger, *handlers: logging.Handler):
+    """Processus fils (fork, ex. process_many) : pas de thread d'écriture, handlers attachés directement."""
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    for handler in handlers:
+        logger.addHandler(handler)
+
+
+# Logger partagé, configuré par setup_logging à l'import des modules appelants
+_logger = logging.getLogger("EIOPA_Monitor")
+
+_DATE_RE = re.compile(r"(\d{8})")
+
+
+@lru_cache(maxsize=2048)
 def parse_date_from_filename(filename: str) -> Optional[datetime]:
-    """Extrait la date (YYYYMMDD) d'un nom de fichier EIOPA."""
-    match = re.search(r"(\d{8})", filename)
-    if match:
+    """Extrait la date (YYYYMMDD) d'un nom de fichier EIOPA (mémoïsé, sans effet de bord)."""
+    match = _DATE_RE.search(filename)
+    if not match:
+        return None
+    digits = match.group(1)
+    try:
+        # Format fixe YYYYMMDD : découpage direct, sans strptime
+        return datetime(int(digits[:4]), int(digits[4:6]), int(digits[6:]))
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=1)
+def excel_engine() -> str:
+    """Moteur de lecture Excel : calamine (Rust, pandas >= 2.2) si installé, sinon openpyxl."""
+    try:
+        import python_calamine  # noqa: F401
+    except ImportError:
+        return "openpyxl"
+    return "calamine"
+
+
+def open_workbook(excel_path: Union[Path, BinaryIO]) -> pd.ExcelFile:
+    """Ouvre un classeur une seule fois pour en lire plusieurs onglets (voir read_excel_sheet)."""
+    return pd.ExcelFile(excel_path, engine=excel_engine())
+
+
+# Onglets déjà lus, en mémoire, clé = (fichier, mtime_ns, taille, onglet, options) ; LRU borné
+_SHEET_CACHE: "OrderedDict[Tuple, pd.DataFrame]" = OrderedDict()
+_SHEET_CACHE_SIZE = 16
+
+
+def read_excel_sheet(source: Union[Path, pd.ExcelFile], sheet_name: str, **kwargs) -> pd.DataFrame:
+    """
+    Lit un onglet Excel avec le moteur le plus rapide disponible (voir excel_engine).
+    source peut être un classeur déjà ouvert par open_workbook, qui n'est alors pas relu.
+
+    Le résultat est conservé en mémoire (_SHEET_CACHE) ; un fichier Excel réécrit change de
+    mtime_ns ou de taille, donc de clé, et est relu.
+    """
+    key = _sheet_cache_key(source, sheet_name, kwargs)
+    if key is not None and key in _SHEET_CACHE:
+        _SHEET_CACHE.move_to_end(key)
+        return _SHEET_CACHE[key].copy()
+
+    if isinstance(source, pd.ExcelFile):
+        df = source.parse(sheet_name=sheet_name, **kwargs)
+    else:
+        df = pd.read_excel(source, sheet_name=sheet_name, engine=excel_engine(), **kwargs)
+
+    if key is not None:
+        _SHEET_CACHE[key] = df.copy()
+        if len(_SHEET_CACHE) > _SHEET_CACHE_SIZE:
+            _SHEET_CACHE.popitem(last=False)
+    return df
+
+
+def _source_path(source: Union[Path, pd.ExcelFile]) -> Optional[Path]:
+    """Chemin du fichier Excel lu, ou None (classeur en mémoire)."""
+    if isinstance(source, pd.ExcelFile):
+        # Chemin passé à pd.ExcelFile (attribut "_io" depuis pandas 3)
+        path = getattr(source, "io", getattr(source, "_io", None))
+    else:
+        path = source
+    return Path(path) if isinstance(path, (str, Path)) else None
+
+
+def _sheet_cache_key(source: Union[Path, pd.ExcelFile], sheet_name: str, kwargs: Dict) -> Optional[Tuple]:
+    """Clé de _SHEET_CACHE, ou None si la source n'est pas un fichier sur disque."""
+    path = _source_path(source)
+    if path is None:
+        return None
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return (str(path.resolve()), stat.st_mtime_ns, stat.st_size, sheet_name, repr(sorted(kwargs.items())))
+
+
+# Position et libellé exact de la colonne pays dans l'onglet, par (onglet, pays), appris à la
+# première lecture complète
+_COUNTRY_COL_POS: Dict[Tuple[str, str], Tuple[int, Hashable]] = {}
+
+
+def read_country_sheet(source: Union[Path, pd.ExcelFile], sheet_name: str, country_code: str) -> pd.DataFrame:
+    """
+    Lit un onglet pivot EIOPA (header ligne 2, index maturité colonne 2) en ne gardant que la
+    colonne du pays. Sa position, apprise à la première lecture complète, est ensuite passée en
+    usecols ; si l'en-tête lu n'est plus exactement celui retenu par find_country_column sur
+    l'onglet complet (schéma modifié), l'onglet est relu en entier.
+    """
+    key = (sheet_name, country_code.upper())
+    learned = _COUNTRY_COL_POS.get(key)
+    if learned is not None:
+        pos, label = learned
         try:
-            return datetime.strptime(match.group(1), "%Y%m%d")
+            df = read_excel_sheet(source, sheet_name, header=1, index_col=0, usecols=[1, pos])
+            # Une sous-chaîne ne suffit pas : « South Africa » contient « fr »
+            if list(df.columns) == [label]:
+                return df
         except ValueError:
-            return None
+            pass
+        _COUNTRY_COL_POS.pop(key, None)
+
+    df = read_excel_sheet(source, sheet_name, header=1, index_col=1)
+    col = find_country_column(tuple(df.columns), country_code)
+    if col is not None:
+        # Colonnes du DataFrame décalées d'une position après l'index (colonne 2 de l'onglet)
+        i = list(df.columns).index(col)
+        if i >= 1:
+            _COUNTRY_COL_POS[key] = (i + 1, col)
+    return df
+
+
+@lru_cache(maxsize=32)
+def find_country_column(columns: Tuple[Hashable, ...], country_code: str) -> Optional[Hashable]:
+    """
+    Localise la colonne pays parmi les en-têtes d'un onglet EIOPA (premier libellé de
+    COUNTRY_ALIASES trouvé). Mémoïsé par en-têtes : le schéma est stable d'un fichier à l'autre.
+    """
+    names = COUNTRY_ALIASES.get(country_code.upper(), [country_code.lower()])
+    lowered = [str(col).lower() for col in columns]
+    for name in names:
+        for col, low in zip(columns, lowered):
+            if name in low:
+                return col
     return None
 
 
@@ -50,8 +206,21 @@ def validate_rate(rate: float) -> bool:
     return MIN_RATE <= rate <= MAX_RATE
 
 
+def validate_rate_array(rates) -> np.ndarray:
+    """Équivalent vectorisé de validate_rate (masque booléen, False pour NaN)."""
+    rates = np.asarray(rates, dtype=float)
+    valid = np.greater_equal(rates, MIN_RATE)
+    return np.logical_and(valid, np.less_equal(rates, MAX_RATE), out=valid)
+
+
 def safe_float_conversion(value) -> Optional[float]:
     """Convertit une valeur en float de manière sécurisée."""
+    # Cas courant (cellule déjà numérique) : ni pd.isna ni nettoyage de chaîne
+    value_type = type(value)
+    if value_type is float:
+        return value if value == value else None  # NaN -> None
+    if value_type is int:
+        return float(value)
     if pd.isna(value):
         return None
     try:
@@ -62,14 +231,26 @@ def safe_float_conversion(value) -> Optional[float]:
         return None
 
 
+def safe_float_series(series: pd.Series) -> pd.Series:
+    """
+    Équivalent vectorisé de safe_float_conversion sur une colonne (float64, NaN si non convertible) :
+    virgule décimale et espaces normalisés pour les cellules texte.
+    """
+    if not pd.api.types.is_numeric_dtype(series):
+        series = series.astype("string").str.replace(",", ".", regex=False).str.replace(" ", "", regex=False)
+    return pd.to_numeric(series, errors="coerce").astype(float)
+
+
 def calculate_bps_change(old_rate: float, new_rate: float) -> float:
     """Calcule la variation en points de base entre deux taux."""
     return (new_rate - old_rate) * 10000
 
 
 def format_bps(bps: float) -> str:
-    sign = "+" if bps >= 0 else ""
-    return f"{sign}{bps:.1f} bps"
+    """Formate une variation en points de base avec son signe (NaN affiché « nan bps »)."""
+    if bps != bps:
+        return "nan bps"
+    return f"{bps:+.1f} bps"
 
 
 def format_rate_pct(rate: float) -> str:
@@ -77,8 +258,12 @@ def format_rate_pct(rate: float) -> str:
 
 
 def get_previous_month_date(reference_date: datetime) -> datetime:
-    """Retourne le dernier jour du mois précédent."""
-    return reference_date.replace(day=1) - timedelta(days=1)
+    """Retourne le dernier jour du mois précédent (même type et même heure que reference_date)."""
+    if reference_date.month > 1:
+        year, month = reference_date.year, reference_date.month - 1
+    else:
+        year, month = reference_date.year - 1, 12
+    return reference_date.replace(year=year, month=month, day=calendar.monthrange(year, month)[1])
 
 
 def get_year_start_date(reference_date: datetime) -> datetime:
@@ -86,6 +271,23 @@ def get_year_start_date(reference_date: datetime) -> datetime:
     return datetime(reference_date.year, 1, 1)
 
 
+def _bps_changes(
+    maturities: List[int], current: np.ndarray, reference_rates: Dict[int, float], out: np.ndarray
+) -> Dict[int, float]:
+    """
+    Variations en bps des maturités communes (ordre de maturities), en un seul vecteur.
+    current : taux courants alignés sur maturities ; out : tampon de même taille, réutilisé.
+    """
+    present = np.fromiter((m in reference_rates for m in maturities), dtype=bool, count=len(maturities))
+    if not present.any():
+        return {}
+    reference = np.fromiter(
+        (reference_rates.get(m, np.nan) for m in maturities), dtype=float, count=len(maturities)
+    )
+    np.multiply(np.subtract(current, reference, out=out), 10000, out=out)
+    return {m: change for m, change, ok in zip(maturities, out.tolist(), present) if ok}
+
+
 def create_summary_dict(
     reference_date: datetime,
     country: str,
@@ -106,21 +308,18 @@ def create_summary_dict(
         "changes_ytd": {},
     }
 
+    # Taux courants vectorisés une fois, partagés par les comparaisons M/M et YTD
+    maturities = list(rates)
+    current = np.fromiter(rates.values(), dtype=float, count=len(maturities))
+    scratch = np.empty_like(current)
+
     if previous_rates:
-        for maturity in rates:
-            if maturity in previous_rates:
-                summary["changes_mom"][maturity] = calculate_bps_change(
-                    previous_rates[maturity], rates[maturity]
-                )
+        summary["changes_mom"].update(_bps_changes(maturities, current, previous_rates, scratch))
         if previous_va is not None and va is not None:
             summary["changes_mom"]["va"] = calculate_bps_change(previous_va, va)
 
     if ytd_rates:
-        for maturity in rates:
-            if maturity in ytd_rates:
-                summary["changes_ytd"][maturity] = calculate_bps_change(
-                    ytd_rates[maturity], rates[maturity]
-                )
+        summary["changes_ytd"].update(_bps_changes(maturities, current, ytd_rates, scratch))
         if ytd_va is not None and va is not None:
             summary["changes_ytd"]["va"] = calculate_bps_change(ytd_va, va)
 